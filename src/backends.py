@@ -0,0 +1,82 @@
+import os
+import importlib
+import threading
+from tracing import span
+
+REDIS_HOST = os.environ.get("RAG_REDIS_HOST", "localhost")
+REDIS_PORT = int(os.environ.get("RAG_REDIS_PORT", "6380"))
+CHROMA_PATH = os.environ.get("RAG_CHROMA_PATH", "./vector_storage")
+# concurrent queries each borrow a pooled connection instead of sharing one socket
+REDIS_MAX_CONNECTIONS = int(os.environ.get("RAG_REDIS_MAX_CONNECTIONS", "32"))
+REDIS_POOL_TIMEOUT = 10
+# with several per-config collections open, chroma keeps the most recently used segments within this many MB
+# (0 = no limit)
+CHROMA_MEMORY_MB = int(os.environ.get("RAG_CHROMA_MEMORY_MB", "0"))
+
+# backend name -> factory; nothing is imported or connected until get() asks for it
+_factories = {}
+_instances = {}
+_lock = threading.Lock()
+
+def register(name, factory):
+    _factories[name] = factory
+
+# create a backend on first use and share it afterwards
+def get(name):
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+
+    with _lock:
+        if name not in _instances:
+            if name not in _factories:
+                raise ValueError(f"Unknown backend: {name}")
+            with span("backend.load", backend=name):
+                _instances[name] = _factories[name]()
+        return _instances[name]
+
+def is_loaded(name):
+    return name in _instances
+
+def loaded():
+    return sorted(_instances)
+
+# forget a backend (or all of them) so the next get() recreates it
+def reset(name=None):
+    with _lock:
+        if name is None:
+            _instances.clear()
+        else:
+            _instances.pop(name, None)
+
+def _module(module_name):
+    return lambda: importlib.import_module(module_name)
+
+def _redis_client():
+    import redis
+    pool = redis.BlockingConnectionPool(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True,
+                                        max_connections=REDIS_MAX_CONNECTIONS, timeout=REDIS_POOL_TIMEOUT)
+    return redis.Redis(connection_pool=pool)
+
+# asyncio client; its connections belong to the event loop that first uses them
+def _redis_async_client():
+    import redis.asyncio
+    pool = redis.asyncio.BlockingConnectionPool(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True,
+                                                max_connections=REDIS_MAX_CONNECTIONS, timeout=REDIS_POOL_TIMEOUT)
+    return redis.asyncio.Redis(connection_pool=pool)
+
+def _chroma_client():
+    import chromadb
+    if not CHROMA_MEMORY_MB:
+        return chromadb.PersistentClient(path=CHROMA_PATH)
+    from chromadb.config import Settings
+    settings = Settings(chroma_segment_cache_policy="LRU", chroma_memory_limit_bytes=CHROMA_MEMORY_MB * 1024 * 1024)
+    return chromadb.PersistentClient(path=CHROMA_PATH, settings=settings)
+
+register("redis", _redis_client)
+register("redis_async", _redis_async_client)
+register("chroma", _chroma_client)
+register("faiss", _module("faiss"))
+register("ollama", _module("ollama"))
+register("sentence_transformers", _module("sentence_transformers"))
+register("fitz", _module("fitz"))
@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from embedding import get_model, get_embeddings, EMBED_BACKENDS
+from embedding_store import load_embeddings
+from results_util import write_results, RESULTS_DIR
+
+DEFAULT_MODELS = ["all-MiniLM-L6-v2", "all-mpnet-base-v2", "intfloat/e5-base-v2"]
+
+# chunk texts from an embedding store, or deterministic course-note-like sentences
+def sample_texts(n_texts, embeddings_stem=None, seed=0):
+    if embeddings_stem:
+        _, columns = load_embeddings(embeddings_stem)
+        return columns["text"][:n_texts]
+    rng = np.random.default_rng(seed)
+    words = ("transaction index query table row column key node tree page lock commit log replica shard "
+             "vector document graph consistency isolation durability atomicity partition").split()
+    return [" ".join(rng.choice(words, size=rng.integers(20, 200))) for _ in range(n_texts)]
+
+def unit_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+# share of the reference top-k neighbours (by cosine) that the candidate embeddings also return
+def neighbour_agreement(reference, candidate, n_queries, top_k=10):
+    n_queries = min(n_queries, len(reference))
+    k = min(top_k, len(reference))
+    ref_top = np.argsort(-(reference[:n_queries] @ reference.T), axis=1)[:, :k]
+    cand_top = np.argsort(-(candidate[:n_queries] @ candidate.T), axis=1)[:, :k]
+    return float(np.mean([len(set(r) & set(c)) / k for r, c in zip(ref_top, cand_top)]))
+
+def bench_backend(model_name, backend, texts, reference, batch_size, n_queries):
+    start = time.perf_counter()
+    model = get_model(model_name, backend)
+    load_sec = time.perf_counter() - start
+
+    # warm up once so lazy session / graph setup is not billed to the throughput run
+    get_embeddings(texts[:batch_size], model, batch_size=batch_size)
+    start = time.perf_counter()
+    embeddings = unit_rows(get_embeddings(texts, model, batch_size=batch_size))
+    encode_sec = time.perf_counter() - start
+
+    # query-time path: one short text per call
+    latencies = []
+    for text in texts[:n_queries]:
+        start = time.perf_counter()
+        get_embeddings([text], model, batch_size=1)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    cosines = np.sum(embeddings * reference, axis=1)
+    return {
+        "model": model_name,
+        "backend": backend,
+        "texts": len(texts),
+        "load_sec": round(load_sec, 3),
+        "chunks_per_sec": round(len(texts) / max(encode_sec, 1e-9), 1),
+        "query_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "query_p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "cosine_mean": round(float(cosines.mean()), 5),
+        "cosine_min": round(float(cosines.min()), 5),
+        "top10_agreement": round(neighbour_agreement(reference, embeddings, n_queries), 4)
+    }
+
+def main():
+    # define CLI arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS)
+    parser.add_argument("--backends", nargs="+", choices=EMBED_BACKENDS, default=EMBED_BACKENDS)
+    parser.add_argument("--embeddings", help="embedding store stem whose chunk texts to encode (default: synthetic)")
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=100, help="single-text encodes for query latency")
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--min_cosine", type=float, default=0.99,
+                        help="exit non-zero if any backend's mean cosine to the torch model is lower")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, f"embedding_{time.strftime('%Y%m%d_%H%M%S')}"))
+    args = parser.parse_args()
+
+    texts = sample_texts(args.texts, args.embeddings)
+    results = []
+    for model_name in args.models:
+        # parity is measured against the full-precision pytorch model
+        reference = unit_rows(get_embeddings(texts, get_model(model_name, "torch"), batch_size=args.batch_size))
+        for backend in args.backends:
+            print(f"Benchmarking {model_name} on {backend}")
+            row = bench_backend(model_name, backend, texts, reference, args.batch_size, args.queries)
+            results.append(row)
+            print(f"  {row['chunks_per_sec']:.1f} chunks/sec, query p50={row['query_p50_ms']:.2f}ms, "
+                  f"cosine mean={row['cosine_mean']:.4f} min={row['cosine_min']:.4f}, "
+                  f"top10 agreement={row['top10_agreement']:.3f}")
+
+    if results:
+        write_results(results, args.output, "embedding benchmark")
+    failing = [f"{row['model']} ({row['backend']})" for row in results if row["cosine_mean"] < args.min_cosine]
+    if failing:
+        print(f"Below the {args.min_cosine} parity threshold: {', '.join(failing)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import os
+import time
+import asyncio
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from llm_scheduler import LLMScheduler, SchedulerBusy, DeadlineExceeded
+from fake_ollama import FakeOllama, DEFAULT_HOST, DEFAULT_PORT
+from results_util import write_results, RESULTS_DIR
+
+# deterministic chat request i with roughly `prompt_words` words of course material
+def make_messages(i, prompt_words):
+    context = " ".join(f"chunk{i % 7}_word{w}" for w in range(prompt_words))
+    return [
+        {"role": "system", "content": "You are a helpful assistant. Use the provided course material to answer the question."},
+        {"role": "user", "content": f"Question {i}: what does this module cover?\n\nCourse Material:\n{context}"}
+    ]
+
+async def run_one(scheduler, model, messages, timeout_sec):
+    metrics = {}
+    start = time.perf_counter()
+    try:
+        await scheduler.chat(model, messages, metrics=metrics, timeout_sec=timeout_sec)
+        status = "ok"
+    except SchedulerBusy:
+        status = "busy"
+    except DeadlineExceeded:
+        status = "timeout"
+    except Exception as e:
+        print(f"Request failed: {type(e).__name__}: {e}")
+        status = "error"
+    return {
+        "status": status,
+        "latency_sec": time.perf_counter() - start,
+        "queue_sec": metrics.get("queue_sec"),
+        "ttft_sec": metrics.get("ttft_sec")
+    }
+
+# open-loop load: requests arrive every 1/rate seconds (all at once when rate is 0), whatever the server does
+async def run_load(scheduler, models, n_requests, rate, prompt_words, timeout_sec):
+    tasks = []
+    start = time.perf_counter()
+    for i in range(n_requests):
+        if rate > 0:
+            await asyncio.sleep(max(start + i / rate - time.perf_counter(), 0))
+        tasks.append(asyncio.create_task(run_one(scheduler, models[i % len(models)], make_messages(i, prompt_words),
+                                                 timeout_sec)))
+    results = await asyncio.gather(*tasks)
+    return results, time.perf_counter() - start
+
+def percentile(values, q):
+    return round(float(np.percentile(values, q)), 4) if values else None
+
+def summarize(results, wall_sec, concurrency, queue_size, rate):
+    ok = [row for row in results if row["status"] == "ok"]
+    latencies = [row["latency_sec"] for row in ok]
+    ttfts = [row["ttft_sec"] for row in ok if row["ttft_sec"] is not None]
+    queues = [row["queue_sec"] for row in ok if row["queue_sec"] is not None]
+    return {
+        "concurrency": concurrency,
+        "queue_size": queue_size,
+        "rate": rate,
+        "requests": len(results),
+        "ok": len(ok),
+        "busy": sum(row["status"] == "busy" for row in results),
+        "timeout": sum(row["status"] == "timeout" for row in results),
+        "error": sum(row["status"] == "error" for row in results),
+        "throughput_rps": round(len(ok) / wall_sec, 3) if wall_sec > 0 else None,
+        "p50_sec": percentile(latencies, 50),
+        "p95_sec": percentile(latencies, 95),
+        "p99_sec": percentile(latencies, 99),
+        "ttft_p50_sec": percentile(ttfts, 50),
+        "ttft_p95_sec": percentile(ttfts, 95),
+        "queue_p95_sec": percentile(queues, 95),
+        "wall_sec": round(wall_sec, 3)
+    }
+
+async def benchmark(args):
+    server = None
+    host = args.ollama_host
+    if host is None:
+        # no real server named: serve the fake one on this event loop
+        fake = FakeOllama(args.base_latency_ms, args.prefill_tokens_per_sec, args.tokens_per_sec,
+                          args.response_tokens, args.parallel)
+        server = await fake.start(DEFAULT_HOST, args.fake_port)
+        host = f"http://{DEFAULT_HOST}:{args.fake_port}"
+        print(f"Started fake Ollama on {host}")
+
+    rows = []
+    try:
+        for concurrency in args.concurrency:
+            executor = ThreadPoolExecutor(max_workers=concurrency * len(args.models))
+            scheduler = LLMScheduler(concurrency, args.queue_size, args.timeout, routes={"*": host}, executor=executor)
+            print(f"Load test: {args.requests} requests at {args.rate or 'max'} req/s, concurrency={concurrency}")
+            results, wall_sec = await run_load(scheduler, args.models, args.requests, args.rate, args.prompt_words,
+                                               args.timeout)
+            # timed-out requests may still be reading the fake server's stream; wait for them off the loop
+            # so the server (on this loop) can finish those streams
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+            row = summarize(results, wall_sec, concurrency, args.queue_size, args.rate)
+            rows.append(row)
+            print(f"  ok={row['ok']} busy={row['busy']} timeout={row['timeout']} "
+                  f"throughput={row['throughput_rps']} req/s p50={row['p50_sec']}s p99={row['p99_sec']}s")
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+    return rows
+
+def main():
+    # define CLI arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ollama_host", help="real ollama server to load (default: start the fake one)")
+    parser.add_argument("--models", nargs="+", default=["mistral"])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=0, help="arrivals per second (0 = all at once)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4], help="scheduler slots to compare")
+    parser.add_argument("--queue_size", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--prompt_words", type=int, default=400)
+    # fake server behaviour
+    parser.add_argument("--fake_port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--base_latency_ms", type=float, default=50)
+    parser.add_argument("--prefill_tokens_per_sec", type=float, default=500)
+    parser.add_argument("--tokens_per_sec", type=float, default=50)
+    parser.add_argument("--response_tokens", type=int, default=64)
+    parser.add_argument("--parallel", type=int, default=2, help="generations the fake server runs at once")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, f"llm_load_{time.strftime('%Y%m%d_%H%M%S')}"))
+    args = parser.parse_args()
+
+    rows = asyncio.run(benchmark(args))
+    if rows:
+        write_results(rows, args.output, "load test")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import faiss
+from embedding_store import load_embeddings, quantize_int8, SUPPORTED_DTYPES
+from vector_stores import FAISS_INDEX_TYPES, DEFAULT_FAISS_PARAMS, build_faiss_index, faiss_needs_training
+from results_util import write_results, RESULTS_DIR
+
+BENCH_INDEX = "bench_index"
+BENCH_PREFIX = "bench:"
+
+# rows processed at a time when generating data or computing ground truth
+BLOCK_ROWS = 100_000
+
+def normalize(vectors):
+    vectors = np.array(vectors, dtype=np.float32, copy=True)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+# clustered, unit-normalized synthetic corpus written to a memory-mapped .npy file
+def synthetic_corpus(n_vectors, dim, n_clusters, workdir, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((n_clusters, dim)))
+    path = os.path.join(workdir, f"synthetic_{n_vectors}x{dim}.npy")
+    corpus = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n_vectors, dim))
+    for start in range(0, n_vectors, BLOCK_ROWS):
+        rows = min(BLOCK_ROWS, n_vectors - start)
+        labels = rng.integers(0, n_clusters, rows)
+        noise = rng.standard_normal((rows, dim), dtype=np.float32) / np.sqrt(dim)
+        block = centers[labels] + noise
+        corpus[start:start + rows] = normalize(block)
+    corpus.flush()
+    return corpus
+
+# queries are perturbed corpus rows so every query has close neighbours
+def sample_queries(corpus, n_queries, seed=1):
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(corpus), size=min(n_queries, len(corpus)), replace=False))
+    base = np.asarray(corpus[rows], dtype=np.float32)
+    return normalize(base + 0.05 * rng.standard_normal(base.shape).astype(np.float32) / np.sqrt(base.shape[1]))
+
+# exact top-k by inner product, scanning the corpus block by block
+def ground_truth(corpus, queries, top_k):
+    best_scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+    best_ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+    for start in range(0, len(corpus), BLOCK_ROWS):
+        block = np.asarray(corpus[start:start + BLOCK_ROWS], dtype=np.float32)
+        scores = queries @ block.T
+        k = min(top_k, scores.shape[1])
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        merged_scores = np.hstack([best_scores, np.take_along_axis(scores, part, axis=1)])
+        merged_ids = np.hstack([best_ids, part + start])
+        order = np.argsort(-merged_scores, axis=1)[:, :top_k]
+        best_scores = np.take_along_axis(merged_scores, order, axis=1)
+        best_ids = np.take_along_axis(merged_ids, order, axis=1)
+    return best_ids
+
+def recall_at_k(retrieved, truth):
+    hits = [len(set(r) & set(t)) / len(t) for r, t in zip(retrieved, truth)]
+    return float(np.mean(hits))
+
+# time single-query searches; returns retrieved ids and per-query latencies in ms
+def time_queries(search_one, queries):
+    retrieved = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        ids = search_one(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        retrieved.append(ids)
+    return retrieved, np.array(latencies)
+
+def summarize(backend, config, corpus, queries, top_k, truth, retrieved, latencies, build_sec, index_bytes):
+    return {
+        "backend": backend,
+        "config": config,
+        "n_vectors": int(len(corpus)),
+        "dim": int(corpus.shape[1]),
+        "n_queries": int(len(queries)),
+        "top_k": top_k,
+        "recall_at_k": round(recall_at_k(retrieved, truth), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "qps": round(len(latencies) / (latencies.sum() / 1000), 1),
+        "build_sec": round(build_sec, 3),
+        "index_bytes": int(index_bytes) if index_bytes is not None else None,
+        "bytes_per_vector": round(index_bytes / len(corpus), 1) if index_bytes is not None and len(corpus) else None
+    }
+
+# random sample of corpus rows to train ivf quantizers on
+def training_sample(corpus, max_rows=100_000, seed=2):
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(corpus), size=min(max_rows, len(corpus)), replace=False))
+    return np.asarray(corpus[rows], dtype=np.float32)
+
+def bench_faiss(corpus, queries, truth, top_k, index_type, params, workdir, nprobe=None, ef_search=None):
+    start = time.perf_counter()
+    train = training_sample(corpus) if faiss_needs_training(index_type) else None
+    index = build_faiss_index(corpus.shape[1], index_type, train, **params)
+    for block_start in range(0, len(corpus), BLOCK_ROWS):
+        index.add(np.ascontiguousarray(corpus[block_start:block_start + BLOCK_ROWS], dtype=np.float32))
+    build_sec = time.perf_counter() - start
+
+    index_path = os.path.join(workdir, f"{index_type}.index")
+    faiss.write_index(index, index_path)
+    index_bytes = os.path.getsize(index_path)
+
+    if index_type.startswith("ivf") and nprobe is not None:
+        faiss.ParameterSpace().set_index_parameter(index, "nprobe", nprobe)
+    if index_type == "hnsw" and ef_search is not None:
+        index.hnsw.efSearch = ef_search
+
+    retrieved, latencies = time_queries(lambda q: index.search(q[None, :], top_k)[1][0], queries)
+    label = ",".join(f"{key}={value}" for key, value in
+                     [("type", index_type), ("nprobe", nprobe), ("ef_search", ef_search)] if value is not None)
+    return summarize("faiss", label, corpus, queries, top_k, truth, retrieved, latencies, build_sec, index_bytes)
+
+# exact search over the corpus stored at a reduced precision, scored against float32 ground truth. the rows are
+# upcast once before timing, so latency is float32 search over the rounded vectors and the row shows the recall
+# cost of the smaller store; the faiss sq_fp16/sq8 rows time search that stays at reduced precision
+def bench_precision(corpus, queries, truth, top_k, dtype):
+    start = time.perf_counter()
+    if dtype == "int8":
+        codes, scales = quantize_int8(corpus)
+        stored_bytes = codes.nbytes + scales.nbytes
+    else:
+        codes, scales = np.asarray(corpus, dtype=dtype), None
+        stored_bytes = codes.nbytes
+    build_sec = time.perf_counter() - start
+
+    vectors = codes.astype(np.float32)
+    if scales is not None:
+        vectors *= scales[:, None] / 127
+
+    def search_one(query):
+        scores = vectors @ query
+        k = min(top_k, len(scores))
+        part = np.argpartition(-scores, k - 1)[:k]
+        return part[np.argsort(-scores[part])]
+
+    retrieved, latencies = time_queries(search_one, queries)
+    return summarize("numpy", f"exact,{dtype}", corpus, queries, top_k, truth, retrieved, latencies,
+                     build_sec, stored_bytes)
+
+# FT.INFO reply is a flat [name, value, ...] list
+def redis_index_info(client):
+    reply = client.execute_command("FT.INFO", BENCH_INDEX)
+    return dict(zip(reply[::2], reply[1::2]))
+
+def bench_redis(corpus, queries, truth, top_k, host, port, batch_size=1000):
+    import redis
+    client = redis.Redis(host=host, port=port)
+    client.ping()
+
+    try:
+        client.execute_command("FT.DROPINDEX", BENCH_INDEX, "DD")
+    except redis.exceptions.ResponseError:
+        pass
+
+    start = time.perf_counter()
+    client.execute_command(
+        "FT.CREATE", BENCH_INDEX, "ON", "HASH", "PREFIX", 1, BENCH_PREFIX,
+        "SCHEMA", "embedding", "VECTOR", "HNSW", 6,
+        "DIM", corpus.shape[1], "TYPE", "FLOAT32", "DISTANCE_METRIC", "COSINE"
+    )
+    for block_start in range(0, len(corpus), batch_size):
+        pipe = client.pipeline(transaction=False)
+        block = np.asarray(corpus[block_start:block_start + batch_size], dtype=np.float32)
+        for offset, vector in enumerate(block):
+            pipe.hset(f"{BENCH_PREFIX}{block_start + offset}", mapping={"embedding": vector.tobytes()})
+        pipe.execute()
+
+    # indexing is asynchronous; wait until every hash is in the vector index
+    while int(redis_index_info(client).get(b"indexing", 0)):
+        time.sleep(0.1)
+    build_sec = time.perf_counter() - start
+
+    index_mb = redis_index_info(client).get(b"vector_index_sz_mb")
+    index_bytes = float(index_mb) * 1024 * 1024 if index_mb is not None else None
+
+    def search_one(query):
+        reply = client.execute_command(
+            "FT.SEARCH", BENCH_INDEX, f"*=>[KNN {top_k} @embedding $vec AS score]",
+            "PARAMS", 2, "vec", query.tobytes(), "SORTBY", "score", "NOCONTENT",
+            "LIMIT", 0, top_k, "DIALECT", 2
+        )
+        return [int(key.decode()[len(BENCH_PREFIX):]) for key in reply[1:]]
+
+    retrieved, latencies = time_queries(search_one, queries)
+    client.execute_command("FT.DROPINDEX", BENCH_INDEX, "DD")
+    return summarize("redis", "hnsw", corpus, queries, top_k, truth, retrieved, latencies, build_sec, index_bytes)
+
+def bench_chroma(corpus, queries, truth, top_k, workdir, batch_size=1000):
+    import chromadb
+    path = os.path.join(workdir, "chroma")
+    client = chromadb.PersistentClient(path=path)
+
+    start = time.perf_counter()
+    collection = client.create_collection(name="bench", metadata={"hnsw:space": "cosine"}, embedding_function=None)
+    batch_size = min(batch_size, client.get_max_batch_size()) if hasattr(client, "get_max_batch_size") else batch_size
+    for block_start in range(0, len(corpus), batch_size):
+        block = np.asarray(corpus[block_start:block_start + batch_size], dtype=np.float32)
+        collection.add(ids=[str(block_start + i) for i in range(len(block))], embeddings=list(block))
+    build_sec = time.perf_counter() - start
+
+    index_bytes = sum(os.path.getsize(os.path.join(root, name))
+                      for root, _, names in os.walk(path) for name in names)
+
+    def search_one(query):
+        result = collection.query(query_embeddings=[query], n_results=top_k, include=[])
+        return [int(i) for i in result["ids"][0]]
+
+    retrieved, latencies = time_queries(search_one, queries)
+    return summarize("chroma", "hnsw", corpus, queries, top_k, truth, retrieved, latencies, build_sec, index_bytes)
+
+def main():
+    # define CLI arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embeddings", help="embedding store stem to benchmark (default: synthetic corpus)")
+    parser.add_argument("--synthetic", type=int, default=10_000, help="synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top_k", type=int, default=10)
+    parser.add_argument("--backends", nargs="+", choices=["faiss", "redis", "chroma", "numpy"],
+                        default=["faiss", "redis", "chroma", "numpy"])
+    parser.add_argument("--faiss_indexes", nargs="+", choices=FAISS_INDEX_TYPES,
+                        default=["flat", "hnsw", "ivf_flat", "ivf_pq", "sq8", "sq_fp16"])
+    parser.add_argument("--precisions", nargs="+", choices=SUPPORTED_DTYPES, default=SUPPORTED_DTYPES,
+                        help="storage precisions for the exact numpy search (recall vs float32 ground truth)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--ef_search", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--redis_host", default="localhost")
+    parser.add_argument("--redis_port", type=int, default=6380)
+    parser.add_argument("--workdir", help="where synthetic data and index files go (default: temp dir)")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, f"retrieval_{time.strftime('%Y%m%d_%H%M%S')}"))
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="rag_bench_")
+    try:
+        if args.embeddings:
+            corpus, _ = load_embeddings(args.embeddings)
+            corpus = normalize(corpus)
+        else:
+            print(f"Generating synthetic corpus: {args.synthetic} x {args.dim}")
+            corpus = synthetic_corpus(args.synthetic, args.dim, args.clusters, workdir)
+
+        queries = sample_queries(corpus, args.queries)
+        print(f"Computing exact ground truth for {len(queries)} queries...")
+        truth = ground_truth(corpus, queries, args.top_k)
+
+        results = []
+        if "faiss" in args.backends:
+            for index_type in args.faiss_indexes:
+                params = dict(DEFAULT_FAISS_PARAMS)
+                if index_type.startswith("ivf"):
+                    runs = [{"nprobe": nprobe} for nprobe in args.nprobe]
+                elif index_type == "hnsw":
+                    runs = [{"ef_search": ef} for ef in args.ef_search]
+                else:
+                    runs = [{}]
+                for run in runs:
+                    print(f"Benchmarking FAISS {index_type} {run}")
+                    results.append(bench_faiss(corpus, queries, truth, args.top_k, index_type, params, workdir, **run))
+
+        if "numpy" in args.backends:
+            for dtype in args.precisions:
+                print(f"Benchmarking exact search at {dtype}")
+                results.append(bench_precision(corpus, queries, truth, args.top_k, dtype))
+
+        if "redis" in args.backends:
+            try:
+                print("Benchmarking Redis")
+                results.append(bench_redis(corpus, queries, truth, args.top_k, args.redis_host, args.redis_port))
+            except Exception as e:
+                print(f"Skipping Redis: {e}")
+
+        if "chroma" in args.backends:
+            try:
+                print("Benchmarking Chroma")
+                results.append(bench_chroma(corpus, queries, truth, args.top_k, workdir))
+            except Exception as e:
+                print(f"Skipping Chroma: {e}")
+
+        for row in results:
+            print(f"{row['backend']:>6} {row['config']:<28} recall@{row['top_k']}={row['recall_at_k']:.3f} "
+                  f"p50={row['p50_ms']:.2f}ms p99={row['p99_ms']:.2f}ms build={row['build_sec']:.1f}s")
+        if results:
+            write_results(results, args.output, "benchmark")
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from results_util import write_results, RESULTS_DIR
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC_DIR = os.path.join(PROJECT_ROOT, "src")
+STARTUP_FIELDS = ["target", "backends", "import_ms", "total_ms", "process_ms", "heavy_loaded", "slowest_imports", "error"]
+
+# modules that should only be imported once a stage actually needs them
+HEAVY_MODULES = ["redis", "chromadb", "faiss", "ollama", "sentence_transformers", "torch", "fitz", "nltk"]
+DEFAULT_TARGETS = ["chunking", "preprocessing", "embedding", "indexing", "query", "query_server"]
+
+# runs in a fresh interpreter: time the import (plus optional backend loads) and list heavy modules pulled in
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+import_sec = time.perf_counter() - start
+import backends
+for name in {backends!r}:
+    backends.get(name)
+total_sec = time.perf_counter() - start
+print(json.dumps({{"import_sec": import_sec, "total_sec": total_sec,
+                  "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+# cumulative import time per top-level package from `python -X importtime` output
+def parse_importtime(stderr, top=5):
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit() or name.startswith(" " * 2):
+            continue
+        packages[name.strip()] = int(cumulative) / 1000
+    return sorted(packages.items(), key=lambda item: -item[1])[:top]
+
+# import one module in a fresh interpreter `repeats` times and report median timings
+def measure(module, load_backends=(), repeats=5):
+    probe = PROBE.format(module=module, backends=list(load_backends), heavy=HEAVY_MODULES)
+    runs = []
+    slowest = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=SRC_DIR,
+                                capture_output=True, text=True)
+        wall_sec = time.perf_counter() - start
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+            return {"target": module, "backends": "+".join(load_backends), "error": error}
+        runs.append((json.loads(result.stdout.strip().splitlines()[-1]), wall_sec))
+        slowest = parse_importtime(result.stderr)
+
+    probe_result = runs[-1][0]
+    return {
+        "target": module,
+        "backends": "+".join(load_backends),
+        "import_ms": round(statistics.median(run["import_sec"] for run, _ in runs) * 1000, 2),
+        "total_ms": round(statistics.median(run["total_sec"] for run, _ in runs) * 1000, 2),
+        "process_ms": round(statistics.median(wall for _, wall in runs) * 1000, 2),
+        "heavy_loaded": " ".join(probe_result["loaded"]),
+        "slowest_imports": " ".join(f"{name}={ms:.0f}ms" for name, ms in slowest),
+        "error": ""
+    }
+
+def main():
+    # define CLI arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--targets", nargs="+", default=DEFAULT_TARGETS, help="modules to import cold")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--budget_ms", type=float, help="exit non-zero if any plain import is slower than this")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, f"startup_{time.strftime('%Y%m%d_%H%M%S')}"))
+    args = parser.parse_args()
+
+    results = [measure(module, repeats=args.repeats) for module in args.targets]
+    # a faiss-only query path must not pull in redis, chroma or ollama
+    results.append(measure("query", load_backends=["faiss"], repeats=args.repeats))
+
+    over_budget = []
+    for row in results:
+        label = row["target"] + (f" +{row['backends']}" if row["backends"] else "")
+        if row["error"]:
+            print(f"{label:<20} failed: {row['error']}")
+            continue
+        print(f"{label:<20} import={row['import_ms']:.1f}ms total={row['total_ms']:.1f}ms "
+              f"process={row['process_ms']:.1f}ms heavy=[{row['heavy_loaded']}]")
+        if args.budget_ms is not None and not row["backends"] and row["import_ms"] > args.budget_ms:
+            over_budget.append(label)
+
+    write_results(results, args.output, "startup", STARTUP_FIELDS)
+    if over_budget:
+        print(f"Over the {args.budget_ms:.0f}ms import budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
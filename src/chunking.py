@@ -2,30 +2,91 @@
 #######
 """
 
-import nltk 
-from nltk.tokenize import word_tokenize
-nltk.download('punkt_tab')
+import re
+from collections import deque
 
-# split text into chunks based on a token count with a specified overlap
-def chunk_by_tokens(text, chunk_size, overlap):
-    # tokenizing the text using NLTK work_tokenize 
-    tokens = word_tokenize(text)
-    chunks = []
+# nltk is imported on first use and its punkt_tab data is looked up locally, once, without downloading
+_word_tokenizer = None
+_sentence_tokenizer = None
+
+# sentence splitter used when punkt_tab is not installed: split after . ! ? followed by whitespace
+class _RegexSentenceTokenizer:
+    def span_tokenize(self, text):
+        for match in re.finditer(r"\S.*?(?:[.!?](?=\s)|$)", text, flags=re.DOTALL):
+            yield match.span()
+
+def _get_sentence_tokenizer():
+    global _sentence_tokenizer
+    if _sentence_tokenizer is None:
+        from nltk.tokenize import PunktTokenizer
+        try:
+            _sentence_tokenizer = PunktTokenizer("english")
+        except LookupError:
+            print("NLTK punkt_tab data not found (install it with `python -m nltk.downloader punkt_tab`); "
+                  "falling back to a regex sentence splitter")
+            _sentence_tokenizer = _RegexSentenceTokenizer()
+    return _sentence_tokenizer
+
+def _get_word_tokenizer():
+    global _word_tokenizer
+    if _word_tokenizer is None:
+        from nltk.tokenize import NLTKWordTokenizer
+        _word_tokenizer = NLTKWordTokenizer()
+    return _word_tokenizer
 
-    # step size = number of new tokens in each chunk 
+# (start_char, end_char) spans of NLTK word tokens, produced one sentence at a time
+def word_token_spans(text):
+    word_tokenizer = _get_word_tokenizer()
+    for sent_start, sent_end in _get_sentence_tokenizer().span_tokenize(text):
+        sentence = text[sent_start:sent_end]
+        try:
+            spans = list(word_tokenizer.span_tokenize(sentence))
+        except ValueError:
+            # NLTK cannot align some quote rewrites back to the source; fall back to whitespace tokens
+            spans = [match.span() for match in re.finditer(r"\S+", sentence)]
+        for start, end in spans:
+            yield sent_start + start, sent_start + end
+
+# (start_char, end_char) spans of an embedding model's own (fast) tokenizer, one line at a time
+def model_token_spans(text, tokenizer):
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        if line.strip():
+            encoding = tokenizer(line, add_special_tokens=False, return_offsets_mapping=True)
+            for start, end in encoding["offset_mapping"]:
+                if end > start:
+                    yield offset + start, offset + end
+        offset += len(line)
+
+# stream (start_char, end_char) spans of overlapping token windows over the original text
+def iter_chunk_spans(text, chunk_size, overlap, tokenizer=None):
+    # step size = number of new tokens in each chunk
     step = chunk_size - overlap
-    if step <= 0: 
+    if step <= 0:
         raise ValueError("Overlap must be smaller than chunk size.")
-    
-    # creating chunks
-    for i in range(0, len(tokens), step):
-        # extracting a slice of tokens for the current chunk 
-        chunk_tokens = tokens[i:i + chunk_size]
-        # reconstructing the text chunk from tokens 
-        chunk_text = " ".join(chunk_tokens)
-        chunks.append(chunk_text)
-    
-    return chunks 
+
+    spans = word_token_spans(text) if tokenizer is None else model_token_spans(text, tokenizer)
+
+    # only the current window of token spans is kept in memory
+    window = deque(maxlen=chunk_size)
+    next_start = 0
+    count = 0
+    for span in spans:
+        window.append(span)
+        count += 1
+        if count - next_start == chunk_size:
+            yield window[0][0], window[-1][1]
+            next_start += step
+
+    # trailing windows that run past the last token
+    while next_start < count:
+        first = window[next_start - (count - len(window))]
+        yield first[0], window[-1][1]
+        next_start += step
+
+# split text into chunks based on a token count with a specified overlap
+def chunk_by_tokens(text, chunk_size, overlap, tokenizer=None):
+    return [text[start:end] for start, end in iter_chunk_spans(text, chunk_size, overlap, tokenizer)]
 
 if __name__ == "__main__":
     # example text for demonstration purposes
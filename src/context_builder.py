@@ -0,0 +1,133 @@
+import re
+
+# context tokens per llm; ollama runs both with a 2048-token window by default, leaving room for the
+# question, system prompt and the 256 generated tokens
+CONTEXT_TOKEN_BUDGETS = {"mistral": 1500, "llama2": 1500}
+DEFAULT_CONTEXT_TOKENS = 1500
+
+# chunks of one document this many characters apart (the whitespace between two tokens) are adjacent
+MAX_MERGE_GAP = 1
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# llama/mistral tokenizers are not loaded here; words and punctuation marks, plus a third for
+# sub-word splits, come close for english course notes
+def estimate_tokens(text):
+    return (len(_TOKEN_PATTERN.findall(text)) * 4 + 2) // 3
+
+def context_budget(model=None, token_budget=None):
+    if token_budget is not None:
+        return token_budget
+    return CONTEXT_TOKEN_BUDGETS.get((model or "").split(":")[0], DEFAULT_CONTEXT_TOKENS)
+
+def _offset(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+# one passage per run of overlapping/adjacent chunks of the same document, in order of their best rank;
+# chunks without positions (stores indexed before offsets were kept) stay separate passages
+def merge_chunks(chunks):
+    passages = []
+    runs = {}
+    for rank, chunk in enumerate(chunks):
+        start, end = _offset(chunk.get("start_char")), _offset(chunk.get("end_char"))
+        passage = {
+            "text": chunk["text"],
+            "module": chunk.get("module"),
+            "source": chunk.get("source") or chunk.get("module"),
+            "start_char": start,
+            "end_char": end,
+            "rank": rank,
+            "chunks": 1
+        }
+        if start is None or end is None or passage["source"] is None:
+            passages.append(passage)
+        else:
+            runs.setdefault(passage["source"], []).append(passage)
+
+    merged_count = 0
+    for source_passages in runs.values():
+        source_passages.sort(key=lambda passage: (passage["start_char"], passage["end_char"]))
+        current = source_passages[0]
+        for passage in source_passages[1:]:
+            if passage["start_char"] > current["end_char"] + MAX_MERGE_GAP:
+                passages.append(current)
+                current = passage
+                continue
+            merged_count += 1
+            if passage["end_char"] > current["end_char"]:
+                overlap = current["end_char"] - passage["start_char"]
+                tail = passage["text"][overlap:] if overlap >= 0 else " " + passage["text"]
+                current["text"] += tail
+                current["end_char"] = passage["end_char"]
+            current["rank"] = min(current["rank"], passage["rank"])
+            current["chunks"] += passage["chunks"]
+        passages.append(current)
+
+    passages.sort(key=lambda passage: passage["rank"])
+    return passages, merged_count
+
+# drop passages whose text (ignoring whitespace and case) already appeared, or is contained in a kept passage
+def dedupe_passages(passages):
+    kept = []
+    keys = []
+    for passage in passages:
+        key = " ".join(passage["text"].split()).lower()
+        if any(key in other for other in keys):
+            continue
+        kept.append(passage)
+        keys.append(key)
+    return kept, len(passages) - len(kept)
+
+# cut text to roughly `tokens` tokens at a word boundary
+def truncate_to_tokens(text, tokens, count_tokens=estimate_tokens):
+    words = text.split(" ")
+    low, high = 0, len(words)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:mid])) <= tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return " ".join(words[:low])
+
+# merged, deduplicated context packed into the llm's token budget, plus a report of what it saved
+def build_context(chunks, model=None, token_budget=None, count_tokens=estimate_tokens):
+    budget = context_budget(model, token_budget)
+    passages, merged = merge_chunks(chunks)
+    passages, duplicates = dedupe_passages(passages)
+
+    packed = []
+    used = 0
+    dropped = 0
+    truncated = False
+    for passage in passages:
+        tokens = count_tokens(passage["text"])
+        if used + tokens <= budget:
+            packed.append(passage["text"])
+            used += tokens
+        elif not packed:
+            # never send an empty context: keep the head of the best passage
+            text = truncate_to_tokens(passage["text"], budget, count_tokens)
+            packed.append(text)
+            used += count_tokens(text)
+            truncated = True
+        else:
+            dropped += 1
+
+    raw_tokens = sum(count_tokens(chunk["text"]) for chunk in chunks)
+    report = {
+        "context_chunks": len(chunks),
+        "context_passages": len(packed),
+        "context_merged": merged,
+        "context_duplicates": duplicates,
+        "context_dropped": dropped,
+        "context_truncated": truncated,
+        "context_budget": budget,
+        "context_tokens": used,
+        "context_tokens_raw": raw_tokens,
+        "context_tokens_saved": raw_tokens - used
+    }
+    return "\n\n".join(packed), report
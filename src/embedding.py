@@ -1,52 +1,209 @@
 import os
-import json
+import time
+import platform
 import argparse
-from sentence_transformers import SentenceTransformer
+import numpy as np
+import backends
 from preprocessing import process_folder
+from embedding_store import config_name, write_embeddings, SUPPORTED_DTYPES
+from embedding_cache import EmbeddingCache, cache_key
+import tracing
+from tracing import span
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MODEL_EXPORT_DIR = os.path.join(PROJECT_ROOT, "model_exports")
+
+# torch = the reference pytorch model; onnx = onnx runtime export; onnx_int8 = that export with int8 weights
+EMBED_BACKENDS = ["torch", "onnx", "onnx_int8"]
+default_backend = os.environ.get("RAG_EMBED_BACKEND", "torch")
 
 # embedding helpers
 model_cache = {}
 
-def get_model(model_name):
-    if model_name not in model_cache:
-        model_cache[model_name] = SentenceTransformer(model_name)
-    return model_cache[model_name]
+def set_backend(backend):
+    global default_backend
+    if backend not in EMBED_BACKENDS:
+        raise ValueError(f"Unsupported embedding backend: {backend}")
+    default_backend = backend
+
+# name the embedding cache files vectors under, so backends never serve each other's vectors
+def cache_model_name(model_name, backend=None):
+    backend = backend or default_backend
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+# dynamic quantization kernel set for this cpu
+def quantization_target():
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    flags = ""
+    if os.path.exists("/proc/cpuinfo"):
+        with open("/proc/cpuinfo", "r") as f:
+            flags = f.read()
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512" in flags:
+        return "avx512"
+    return "avx2"
+
+# onnx export of a model, written once under model_exports/ and loaded from there afterwards
+def load_onnx_model(model_name, quantized=False):
+    st = backends.get("sentence_transformers")
+    export_dir = os.path.join(MODEL_EXPORT_DIR, model_name.replace("/", "_"))
+    if not os.path.exists(os.path.join(export_dir, "onnx", "model.onnx")):
+        print(f"Exporting {model_name} to ONNX in {export_dir}")
+        st.SentenceTransformer(model_name, backend="onnx").save_pretrained(export_dir)
+    if not quantized:
+        return st.SentenceTransformer(export_dir, backend="onnx")
+
+    target = quantization_target()
+    file_name = os.path.join("onnx", f"model_qint8_{target}.onnx")
+    if not os.path.exists(os.path.join(export_dir, file_name)):
+        print(f"Quantizing the {model_name} ONNX export to int8 ({target})")
+        st.export_dynamic_quantized_onnx_model(st.SentenceTransformer(export_dir, backend="onnx"), target,
+                                               export_dir, file_suffix=f"qint8_{target}")
+    return st.SentenceTransformer(export_dir, backend="onnx", model_kwargs={"file_name": file_name})
+
+def get_model(model_name, backend=None):
+    backend = backend or default_backend
+    key = (model_name, backend)
+    if key not in model_cache:
+        with span("embedding.load", model=model_name, backend=backend):
+            if backend == "torch":
+                model_cache[key] = backends.get("sentence_transformers").SentenceTransformer(model_name)
+            elif backend in ("onnx", "onnx_int8"):
+                model_cache[key] = load_onnx_model(model_name, quantized=backend == "onnx_int8")
+            else:
+                raise ValueError(f"Unsupported embedding backend: {backend}")
+    return model_cache[key]
 
 def get_embedding(text, model):
     return model.encode(text, show_progress_bar=False).tolist()
 
+# encode many texts in length-sorted batches; rows come back in input order
+def get_embeddings(texts, model, batch_size=64, pool=None):
+    if len(texts) == 0:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    # bucket similar lengths together so each batch pads as little as possible
+    order = np.argsort([-len(text) for text in texts], kind="stable")
+    sorted_texts = [texts[i] for i in order]
+
+    if pool is not None:
+        encoded = model.encode_multi_process(sorted_texts, pool, batch_size=batch_size)
+    else:
+        encoded = np.vstack([
+            model.encode(sorted_texts[start:start + batch_size], batch_size=batch_size,
+                         show_progress_bar=False, convert_to_numpy=True)
+            for start in range(0, len(sorted_texts), batch_size)
+        ])
+
+    # scatter rows back to their original positions
+    embeddings = np.empty(encoded.shape, dtype=np.float32)
+    embeddings[order] = encoded
+    return embeddings
+
+# embed texts, only calling the model for texts missing from the cache
+def get_embeddings_cached(texts, model, model_name, cache, batch_size=64, pool=None):
+    cached = cache.get_many(model_name, texts)
+    embeddings = list(cached)
+
+    # encode each distinct missing text once
+    missing = {}
+    for i, vector in enumerate(cached):
+        if vector is None:
+            missing.setdefault(cache_key(model_name, texts[i]), []).append(i)
+
+    if missing:
+        positions = list(missing.values())
+        missing_texts = [texts[rows[0]] for rows in positions]
+        encoded = get_embeddings(missing_texts, model, batch_size=batch_size, pool=pool)
+        cache.put_many(model_name, missing_texts, encoded)
+        for rows, vector in zip(positions, encoded):
+            for i in rows:
+                embeddings[i] = vector
+
+    if not embeddings:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    return np.vstack(embeddings).astype(np.float32, copy=False)
+
+# multi-process encoding pool for cpu-only hosts
+def start_embedding_pool(model, workers):
+    return model.start_multi_process_pool(target_devices=["cpu"] * workers)
+
+def stop_embedding_pool(model, pool):
+    model.stop_multi_process_pool(pool)
+
 # embedding pipeline
-def run_embedding_pipeline(selected_models, selected_chunk_sizes, selected_overlaps):
-    
+def run_embedding_pipeline(selected_models, selected_chunk_sizes, selected_overlaps, dtype="float32",
+                           batch_size=64, workers=0, use_cache=True, cache_size_mb=1024,
+                           chunk_tokenizer="nltk", embed_backend=None):
+    embed_backend = embed_backend or default_backend
+
     # set input and output directories
     DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data"))
     OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "embedding_results"))
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
 
-    # preprocess data
-    raw_data = process_folder(DATA_DIR)
+    # preprocess data once per chunking configuration (and per model when chunking by model tokens)
+    chunk_sets = {}
+    def get_chunks(model_name, model, chunk_size, overlap):
+        tokenizer = model.tokenizer if chunk_tokenizer == "model" else None
+        key = (model_name if tokenizer is not None else None, chunk_size, overlap)
+        if key not in chunk_sets:
+            chunk_sets[key] = process_folder(DATA_DIR, chunk_size, overlap, tokenizer=tokenizer)
+        return chunk_sets[key]
+
+    cache = EmbeddingCache(max_bytes=cache_size_mb * 1024 * 1024) if use_cache else None
 
     # generate embeddings
+    throughput = {}
     for model_name in selected_models:
-        model = get_model(model_name)
-        for chunk_size in selected_chunk_sizes:
-            for overlap in selected_overlaps:
-                output_file = os.path.join(
-                    OUTPUT_DIR,
-                    f"{model_name.replace('/', '_')}__chunk{chunk_size}_overlap{overlap}.json"
-                )
+        model = get_model(model_name, embed_backend)
+        # onnx runtime already spreads one batch over every core; worker processes only apply to torch
+        pool = start_embedding_pool(model, workers) if workers > 1 and embed_backend == "torch" else None
+        model_chunks = 0
+        model_seconds = 0.0
+
+        try:
+            for chunk_size in selected_chunk_sizes:
+                for overlap in selected_overlaps:
+                    output_stem = os.path.join(OUTPUT_DIR, config_name(model_name, chunk_size, overlap))
+                    chunks = get_chunks(model_name, model, chunk_size, overlap)
+
+                    print(f"Embedding with {model_name} | chunk={chunk_size}, overlap={overlap}")
+                    texts = [chunk["text"] for chunk in chunks]
+                    start = time.perf_counter()
+                    with span("embedding.encode", model=model_name, backend=embed_backend, chunk_size=chunk_size,
+                              overlap=overlap, chunks=len(texts)) as encode_span:
+                        if cache is not None:
+                            cache.reset_stats()
+                            embeddings = get_embeddings_cached(texts, model,
+                                                               cache_model_name(model_name, embed_backend), cache,
+                                                               batch_size=batch_size, pool=pool)
+                            encode_span.tag(cache_hits=cache.hits, cache_misses=cache.misses)
+                            print(f"Embedding cache: {cache.hits} hits, {cache.misses} misses")
+                        else:
+                            embeddings = get_embeddings(texts, model, batch_size=batch_size, pool=pool)
+                    elapsed = time.perf_counter() - start
+                    model_chunks += len(chunks)
+                    model_seconds += elapsed
 
-                print(f"Embedding with {model_name} | chunk={chunk_size}, overlap={overlap}")
-                output = []
-                for key, text in raw_data.items():
-                    embedding = get_embedding(text, model)
-                    output.append({"text": text, "embedding": embedding, "module": key, "slide_number": 1})
+                    matrix_path, _ = write_embeddings(output_stem, embeddings, chunks, dtype=dtype)
+                    print(f"Saved {len(chunks)} entries to {matrix_path} "
+                          f"({len(chunks) / max(elapsed, 1e-9):.1f} chunks/sec)")
+        finally:
+            if pool is not None:
+                stop_embedding_pool(model, pool)
 
-                with open(output_file, "w", encoding="utf-8") as f:
-                    json.dump(output, f, indent=2)
+        throughput[model_name] = model_chunks / max(model_seconds, 1e-9)
+        print(f"{model_name} ({embed_backend}): {model_chunks} chunks in {model_seconds:.2f}s "
+              f"({throughput[model_name]:.1f} chunks/sec)")
 
-                print(f"Saved {len(output)} entries to {output_file}")
+    if cache is not None:
+        cache.close()
+
+    return throughput
 
 def main():
     # define CLI arguments
@@ -54,14 +211,38 @@ def main():
     parser.add_argument("--model", required=True)
     parser.add_argument("--chunk_size", type=int, required=True)
     parser.add_argument("--overlap", type=int, required=True)
+    parser.add_argument("--dtype", choices=SUPPORTED_DTYPES, default="float32")
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=0, help="encoding processes (cpu-only hosts)")
+    parser.add_argument("--no_cache", action="store_true", help="always re-embed every chunk")
+    parser.add_argument("--cache_size_mb", type=int, default=1024)
+    parser.add_argument("--chunk_tokenizer", choices=["nltk", "model"], default="nltk",
+                        help="count chunk_size in NLTK words or in the embedding model's tokens")
+    parser.add_argument("--embed_backend", choices=EMBED_BACKENDS, default=default_backend,
+                        help="torch, or an ONNX Runtime export (onnx) / its int8-quantized variant (onnx_int8)")
+    parser.add_argument("--trace", help="record per-stage spans and export them to this .json/.csv file")
     args = parser.parse_args()
 
+    if args.trace:
+        tracing.enable()
+
     # run pipeline
     run_embedding_pipeline(
         selected_models=[args.model],
         selected_chunk_sizes=[args.chunk_size],
-        selected_overlaps=[args.overlap]
+        selected_overlaps=[args.overlap],
+        dtype=args.dtype,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        use_cache=not args.no_cache,
+        cache_size_mb=args.cache_size_mb,
+        chunk_tokenizer=args.chunk_tokenizer,
+        embed_backend=args.embed_backend
     )
 
+    if args.trace:
+        tracing.print_summary()
+        tracing.export(args.trace)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,101 @@
+import os
+import time
+import sqlite3
+import hashlib
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_CACHE_PATH = os.path.join(PROJECT_ROOT, "embedding_cache", "embeddings.sqlite")
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# sqlite limits the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+# collapse whitespace so re-extracted text with different spacing maps to the same entry
+def normalize_text(text):
+    return " ".join(text.split())
+
+def cache_key(model_name, text):
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+# on-disk embedding cache keyed by (model, normalized text hash) with lru eviction
+class EmbeddingCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, dim INTEGER, vector BLOB, last_used REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings(last_used)")
+        self.conn.commit()
+
+    # cached vectors for texts, None where missing
+    def get_many(self, model_name, texts):
+        keys = [cache_key(model_name, text) for text in texts]
+        found = {}
+        for start in range(0, len(keys), _LOOKUP_BATCH):
+            batch = list(set(keys[start:start + _LOOKUP_BATCH]))
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            for key, vector in rows:
+                found[key] = np.frombuffer(vector, dtype=np.float32)
+
+        # touch hits so they survive eviction
+        now = time.time()
+        self.conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                              [(now, key) for key in found])
+        self.conn.commit()
+
+        results = [found.get(key) for key in keys]
+        hits = sum(result is not None for result in results)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model_name, texts, vectors):
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            vector = np.asarray(vector, dtype=np.float32)
+            rows.append((cache_key(model_name, text), int(vector.shape[0]), vector.tobytes(), now))
+        self.conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+        self.conn.commit()
+        self.evict()
+
+    def size_bytes(self):
+        return self.conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    # drop least recently used entries until the cache fits its size cap
+    def evict(self):
+        excess = self.size_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+
+        stale = []
+        for key, size in self.conn.execute(
+            "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used ASC"
+        ):
+            stale.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+
+        self.conn.executemany("DELETE FROM embeddings WHERE key = ?", stale)
+        self.conn.commit()
+        return len(stale)
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,162 @@
+import json
+import numpy as np
+
+METADATA_COLUMNS = ["text", "module", "slide_number", "source", "start_char", "end_char"]
+SUPPORTED_DTYPES = ["float32", "float16", "int8"]
+# metadata columns stored as small integer codes into a table of distinct values
+CATEGORICAL_COLUMNS = ["module", "source"]
+# metadata columns stored as int32 arrays when every value is an int
+INTEGER_COLUMNS = ["slide_number", "start_char", "end_char"]
+
+# shared file name for a (model, chunk_size, overlap) configuration
+def config_name(model_name, chunk_size, overlap):
+    return f"{model_name.replace('/', '_')}__chunk{chunk_size}_overlap{overlap}"
+
+# strip a known store extension so callers can pass either the stem or a file path
+def store_stem(path):
+    for ext in (".npy", ".meta.json", ".json"):
+        if path.endswith(ext):
+            return path[:-len(ext)]
+    return path
+
+# matrix file and metadata table for a store stem
+def store_paths(stem):
+    stem = store_stem(stem)
+    return f"{stem}.npy", f"{stem}.meta.json"
+
+# per-row scales of an int8 store
+def scale_path(stem):
+    return f"{store_stem(stem)}.scale.npy"
+
+# symmetric per-row int8 quantization: row ~= codes * scale / 127
+def quantize_int8(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) if len(matrix) else np.zeros(0, dtype=np.float32)
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scales[:, None] * 127), -127, 127).astype(np.int8)
+    return codes, scales
+
+# int8 rows plus one float32 scale per row; indexing dequantizes only the rows asked for
+class QuantizedMatrix:
+    dtype = np.dtype("int8")
+
+    def __init__(self, codes, scales):
+        self.codes = codes
+        self.scales = scales
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.scales.nbytes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, rows):
+        return self.codes[rows].astype(np.float32) * (self.scales[rows] / 127)[..., None]
+
+    def __array__(self, dtype=None, copy=None):
+        matrix = self[:]
+        return matrix if dtype is None else matrix.astype(dtype, copy=False)
+
+# write embeddings as one contiguous matrix plus a columnar metadata table
+def write_embeddings(stem, embeddings, records, dtype="float32"):
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+    matrix_path, meta_path = store_paths(stem)
+    if dtype == "int8":
+        matrix, scales = quantize_int8(embeddings)
+        np.save(scale_path(stem), scales)
+    else:
+        matrix = np.ascontiguousarray(embeddings, dtype=dtype)
+    if matrix.ndim != 2 or len(matrix) != len(records):
+        raise ValueError(f"Expected {len(records)} embedding rows, got shape {matrix.shape}")
+    np.save(matrix_path, matrix)
+
+    columns = {column: [record.get(column) for record in records] for column in METADATA_COLUMNS}
+    metadata = {
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]),
+        "dtype": dtype,
+        "columns": columns
+    }
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, separators=(",", ":"))
+
+    return matrix_path, meta_path
+
+# read a store back; with mmap the matrix is a zero-copy view of the file (int8 stores dequantize on access)
+def load_embeddings(stem, mmap=True):
+    matrix_path, meta_path = store_paths(stem)
+    matrix = np.load(matrix_path, mmap_mode="r" if mmap else None)
+
+    with open(meta_path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    if metadata.get("dtype") == "int8":
+        matrix = QuantizedMatrix(matrix, np.load(scale_path(stem)))
+
+    if matrix.shape != (metadata["count"], metadata["dim"]):
+        raise ValueError(f"Embedding matrix {matrix_path} does not match its metadata table")
+    return matrix, metadata["columns"]
+
+# row-oriented view of the metadata table
+def metadata_rows(columns):
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*(columns[name] for name in names))]
+
+# float32 view for consumers (faiss, redis) that need it; copies only for float16 / int8 stores
+def as_float32(matrix):
+    return np.asarray(matrix, dtype=np.float32)
+
+# precision an embedding matrix was stored at
+def matrix_precision(matrix):
+    return str(np.dtype(matrix.dtype))
+
+# read-only columnar chunk metadata: interned module/source codes and int position columns instead of a dict per row
+class ChunkTable:
+    def __init__(self, columns):
+        self.count = len(next(iter(columns.values()))) if columns else 0
+        self.columns = {}
+        self.categories = {}
+        for name, values in columns.items():
+            if name in CATEGORICAL_COLUMNS:
+                categories = {}
+                codes = np.array([categories.setdefault(value, len(categories)) for value in values], dtype=np.int32)
+                self.columns[name] = codes
+                self.categories[name] = list(categories)
+            elif name in INTEGER_COLUMNS and all(isinstance(value, int) for value in values):
+                self.columns[name] = np.array(values, dtype=np.int32)
+            else:
+                self.columns[name] = list(values)
+
+    def __len__(self):
+        return self.count
+
+    def value(self, name, i):
+        column = self.columns[name]
+        if name in self.categories:
+            return self.categories[name][column[i]]
+        return int(column[i]) if isinstance(column, np.ndarray) else column[i]
+
+    def __getitem__(self, i):
+        return {name: self.value(name, i) for name in self.columns}
+
+    def __iter__(self):
+        return (self[i] for i in range(self.count))
+
+    # row ids per distinct value of a column
+    def groups(self, name):
+        if name not in self.columns:
+            return {None: np.arange(self.count, dtype=np.int64)}
+        if name not in self.categories:
+            rows = {}
+            for i in range(self.count):
+                rows.setdefault(self.value(name, i), []).append(i)
+            return {value: np.array(ids, dtype=np.int64) for value, ids in rows.items()}
+        codes = self.columns[name]
+        return {value: np.flatnonzero(codes == code).astype(np.int64)
+                for code, value in enumerate(self.categories[name])}
@@ -0,0 +1,146 @@
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+from datetime import datetime, timezone
+from http_util import read_request, write_json, start_chunked, write_chunk, end_chunks
+from context_builder import estimate_tokens
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 11435
+
+WORDS = [
+    "the", "database", "transaction", "index", "query", "table", "row", "column", "key", "node",
+    "tree", "page", "lock", "commit", "log", "replica", "shard", "vector", "document", "graph",
+    "is", "are", "stores", "reads", "writes", "keeps", "uses", "and", "or", "with", "of", "in", "a"
+]
+
+# stand-in for `ollama serve`: /api/chat answers with deterministic text at a configured speed.
+# prefill takes base latency + prompt tokens / prefill rate, then tokens stream at the decode rate;
+# at most `parallel` generations run at once and the rest wait, like OLLAMA_NUM_PARALLEL
+class FakeOllama:
+    def __init__(self, base_latency_ms=50, prefill_tokens_per_sec=500, tokens_per_sec=20, response_tokens=128,
+                 parallel=1, jitter=0.0):
+        self.base_latency_sec = base_latency_ms / 1000
+        self.prefill_tokens_per_sec = prefill_tokens_per_sec
+        self.tokens_per_sec = tokens_per_sec
+        self.response_tokens = response_tokens
+        self.parallel = parallel
+        self.jitter = jitter
+        self.slots = None
+        self.requests = 0
+
+    # same model and messages -> same answer and same timings
+    def plan(self, request):
+        messages = request.get("messages") or []
+        digest = hashlib.sha256(json.dumps([request.get("model"), messages], sort_keys=True).encode("utf-8"))
+        rng = random.Random(digest.hexdigest())
+
+        prompt_tokens = sum(estimate_tokens(message.get("content") or "") for message in messages)
+        options = request.get("options") or {}
+        eval_tokens = max(1, min(self.response_tokens, options.get("num_predict") or self.response_tokens))
+        scale = 1 + rng.uniform(-self.jitter, self.jitter)
+        prefill_sec = (self.base_latency_sec + prompt_tokens / self.prefill_tokens_per_sec) * scale
+        token_sec = scale / self.tokens_per_sec
+        tokens = [rng.choice(WORDS) + " " for _ in range(eval_tokens)]
+        return prompt_tokens, prefill_sec, token_sec, tokens
+
+    @staticmethod
+    def message(model, content, done, **extra):
+        return {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": content},
+            "done": done,
+            **extra
+        }
+
+    async def chat(self, writer, request):
+        model = request.get("model") or "fake"
+        prompt_tokens, prefill_sec, token_sec, tokens = self.plan(request)
+        stream = request.get("stream", True)
+
+        start = time.perf_counter()
+        async with self.slots:
+            load_sec = time.perf_counter() - start
+            await asyncio.sleep(prefill_sec)
+            if stream:
+                await start_chunked(writer, 200)
+            decode_start = time.perf_counter()
+            for token in tokens:
+                await asyncio.sleep(token_sec)
+                if stream:
+                    await write_chunk(writer, json.dumps(self.message(model, token, False)).encode("utf-8") + b"\n")
+            decode_sec = time.perf_counter() - decode_start
+
+        final = self.message(
+            model, "" if stream else "".join(tokens), True,
+            done_reason="stop",
+            total_duration=int((time.perf_counter() - start) * 1e9),
+            load_duration=int(load_sec * 1e9),
+            prompt_eval_count=prompt_tokens,
+            prompt_eval_duration=int(prefill_sec * 1e9),
+            eval_count=len(tokens),
+            eval_duration=int(decode_sec * 1e9)
+        )
+        if stream:
+            await write_chunk(writer, json.dumps(final).encode("utf-8") + b"\n")
+            await end_chunks(writer)
+        else:
+            await write_json(writer, 200, final)
+
+    async def handle(self, reader, writer):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, path, _, body = request
+            if method == "POST" and path == "/api/chat":
+                self.requests += 1
+                await self.chat(writer, json.loads(body or b"{}"))
+            elif method == "GET" and path == "/api/version":
+                await write_json(writer, 200, {"version": "0.0.0-fake"})
+            elif method == "GET" and path == "/api/tags":
+                await write_json(writer, 200, {"models": []})
+            else:
+                await write_json(writer, 404, {"error": f"Unknown endpoint: {method} {path}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.slots = asyncio.Semaphore(self.parallel)
+        return await asyncio.start_server(self.handle, host, port)
+
+async def serve(fake, host, port):
+    server = await fake.start(host, port)
+    print(f"Fake Ollama listening on http://{host}:{port} "
+          f"(prefill {fake.prefill_tokens_per_sec} tok/s, decode {fake.tokens_per_sec} tok/s, parallel {fake.parallel})")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    # define CLI arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--base_latency_ms", type=float, default=50, help="fixed latency before the first token")
+    parser.add_argument("--prefill_tokens_per_sec", type=float, default=500)
+    parser.add_argument("--tokens_per_sec", type=float, default=20, help="decode speed per request")
+    parser.add_argument("--response_tokens", type=int, default=128, help="tokens per answer (capped by num_predict)")
+    parser.add_argument("--parallel", type=int, default=1, help="generations served at once")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- fraction applied to timings, seeded per request")
+    args = parser.parse_args()
+
+    fake = FakeOllama(args.base_latency_ms, args.prefill_tokens_per_sec, args.tokens_per_sec,
+                      args.response_tokens, args.parallel, args.jitter)
+    try:
+        asyncio.run(serve(fake, args.host, args.port))
+    except KeyboardInterrupt:
+        print("Fake Ollama stopped.")
+
+if __name__ == "__main__":
+    main()
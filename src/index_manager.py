@@ -0,0 +1,82 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+import tracing
+from vector_stores import get_store, drop_store, faiss_index_paths
+
+# memory the in-process faiss indexes may use together; redis indexes live in the redis server and chroma
+# bounds its own segment cache (RAG_CHROMA_MEMORY_MB)
+INDEX_BUDGET_MB = float(os.environ.get("RAG_INDEX_BUDGET_MB", "2048"))
+
+# bytes a loaded faiss config is charged: index file plus metadata sidecar
+def faiss_resident_bytes(config_name):
+    return sum(os.path.getsize(path) for path in faiss_index_paths(config_name) if os.path.exists(path))
+
+# keeps the most recently used faiss configs loaded within a memory budget; the least recently used are
+# dropped and memory-mapped back from disk the next time they are queried
+class IndexManager:
+    def __init__(self, budget_mb=INDEX_BUDGET_MB):
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.resident = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_sec = 0.0
+
+    # loaded faiss store for a config, marked most recently used
+    def faiss(self, config_name):
+        store = get_store("faiss", config_name)
+        loaded_mtime = store.mtime if store.index is not None else None
+        start = time.perf_counter()
+        # loads (and reloads of an index file rebuilt since it was opened) hold only that store's lock, so a cold
+        # config never stalls queries against the others
+        store.ensure_loaded()
+        load_sec = time.perf_counter() - start
+        resident_bytes = faiss_resident_bytes(config_name)
+
+        with self.lock:
+            if store.mtime == loaded_mtime:
+                self.hits += 1
+            else:
+                self.loads += 1
+                self.load_sec += load_sec
+                tracing.record("index.load", load_sec, config=config_name)
+            self.resident[config_name] = resident_bytes
+            self.resident.move_to_end(config_name)
+            self.evict(keep=config_name)
+        return store
+
+    # drop least recently used configs until the rest fit the budget; the one in use always stays
+    def evict(self, keep=None):
+        for config_name in list(self.resident):
+            if sum(self.resident.values()) <= self.budget_bytes:
+                break
+            if config_name == keep:
+                continue
+            del self.resident[config_name]
+            drop_store("faiss", config_name)
+            self.evictions += 1
+            print(f"Evicted FAISS index {config_name} from memory")
+
+    def stats(self):
+        return {
+            "budget_mb": self.budget_bytes / 1024 / 1024,
+            "resident_mb": sum(self.resident.values()) / 1024 / 1024,
+            "resident": list(self.resident),
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "mean_load_ms": self.load_sec / self.loads * 1000 if self.loads else 0.0
+        }
+
+manager = IndexManager()
+
+# searchable store for a config: faiss through the resident-set manager, redis/chroma by their per-config namespace
+def open_index(vector_db, config_name):
+    if vector_db == "faiss":
+        return manager.faiss(config_name)
+    if vector_db in ("redis", "redis_async", "chroma"):
+        return get_store(vector_db, config_name)
+    raise ValueError(f"Unsupported vector DB: {vector_db}")
@@ -0,0 +1,33 @@
+import os
+import json
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CONFIG_FILE = os.path.join(PROJECT_ROOT, "last_indexed_config.json")
+
+# every indexed config, oldest first; older files held a single config object
+def load_indexed_configs():
+    if not os.path.exists(CONFIG_FILE):
+        return []
+    with open(CONFIG_FILE, "r") as f:
+        data = json.load(f)
+    return data.get("configs", []) if "configs" in data else [data]
+
+# most recently indexed config, or None
+def latest_indexed_config():
+    configs = load_indexed_configs()
+    return configs[-1] if configs else None
+
+# add (or refresh) a config's entry, merging the vector dbs it is indexed in, and make it the latest
+def record_indexed_config(model, chunk_size, overlap, vector_dbs):
+    configs = load_indexed_configs()
+    previous = [config for config in configs
+                if (config["model"], config["chunk_size"], config["overlap"]) == (model, chunk_size, overlap)]
+    merged_dbs = list(dict.fromkeys([db for config in previous for db in config.get("vector_dbs", [])] + vector_dbs))
+    configs = [config for config in configs if config not in previous]
+    configs.append({"model": model, "chunk_size": chunk_size, "overlap": overlap, "vector_dbs": merged_dbs})
+
+    tmp_path = f"{CONFIG_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"configs": configs}, f, indent=2)
+    os.replace(tmp_path, CONFIG_FILE)
+    return configs
@@ -1,123 +1,162 @@
 import os
 import json
-import redis
-import numpy as np
-import chromadb
-import faiss
-
-VECTOR_DIM = 768
-DOC_PREFIX = "doc:"
-INDEX_NAME = "embedding_index"
-
-redis_client = redis.Redis(host="localhost", port=6380, decode_responses=True)
-chroma_client = chromadb.PersistentClient(path="./vector_storage")
-
-faiss_index = faiss.IndexFlatL2(VECTOR_DIM)
-faiss_vectors = []
-faiss_metadata = []
-
-# create chroma collection based on appropriate dimension
-def create_chroma_collection(dimension, name="course_notes"):
-    try:
-        chroma_client.delete_collection(name)
-    except Exception:
-        pass
-
-    try:
-        return chroma_client.create_collection(
-            name=name,
-            metadata={"hnsw:space": "cosine"},
-            embedding_function=None,
-            dimension=dimension
-        )
-    except TypeError:
-        # fallback for chrom versions that do not support dimension argument
-        print(f"Chroma doesn't support `dimension=` in this version. Falling back without it.")
-        return chroma_client.create_collection(
-            name=name,
-            metadata={"hnsw:space": "cosine"},
-            embedding_function=None
-        )
-
-# index redis
-def create_hnsw_index():
-    try:
-        redis_client.execute_command(f"FT.DROPINDEX {INDEX_NAME} DD")
-    except redis.exceptions.ResponseError:
-        pass
-
-    redis_client.execute_command(
-        f"""
-        FT.CREATE {INDEX_NAME} ON HASH PREFIX 1 {DOC_PREFIX}
-        SCHEMA text TEXT module TEXT slide_number TEXT
-        embedding VECTOR HNSW 6 
-        DIM {VECTOR_DIM} 
-        TYPE FLOAT32 
-        DISTANCE_METRIC COSINE
-        """
-    )
-
-# index faiss
-def reset_faiss_index(new_dim):
-    global faiss_index, faiss_metadata
-    print(f"Resetting FAISS index to dimension: {new_dim}")
-    faiss_index = faiss.IndexFlatL2(new_dim)
-    faiss_metadata = []
+import time
+import hashlib
+from query_cache import mark_index_rebuilt
+from tracing import span
+from embedding_store import load_embeddings, metadata_rows, store_stem, matrix_precision
+from vector_stores import VECTOR_DIM, FaissStore, chunk_id, faiss_index_for_precision, get_store
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MANIFEST_DIR = os.path.join(PROJECT_ROOT, "manifests")
+
+# namespace a store writes into: every backend keeps one index per config (faiss file, redis index + key
+# prefix, chroma collection), so several configs can be indexed side by side
+def store_namespace(config_name, vector_db, collection_name=None):
+    if vector_db == "chroma":
+        return collection_name or config_name
+    return config_name
+
+# store to write a config into; faiss gets a fresh writable index, redis/chroma use the long-lived store
+def open_store(config_name, vector_db, collection_name=None, faiss_index_type="flat", faiss_params=None):
+    if vector_db == "faiss":
+        return FaissStore(config_name, faiss_index_type, faiss_params)
+    return get_store(vector_db, store_namespace(config_name, vector_db, collection_name))
+
+# per-namespace record of which config is indexed and which chunks belong to each source document
+def manifest_path(namespace, vector_db):
+    return os.path.join(MANIFEST_DIR, f"{vector_db}__{namespace}.json")
+
+def load_manifest(namespace, vector_db):
+    path = manifest_path(namespace, vector_db)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(namespace, vector_db, manifest):
+    if not os.path.exists(MANIFEST_DIR):
+        os.makedirs(MANIFEST_DIR)
+    with open(manifest_path(namespace, vector_db), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+# manifest entries for the chunks currently in the embedding store
+def build_manifest(config_name, data):
+    sources = {}
+    for entry in data:
+        sources.setdefault(entry["source"], []).append(entry)
+
+    manifest = {"config": config_name, "sources": {}}
+    for source, entries in sources.items():
+        digest = hashlib.sha256("\0".join(entry["text"] for entry in entries).encode("utf-8"))
+        manifest["sources"][source] = {
+            "fingerprint": digest.hexdigest(),
+            "chunk_ids": [chunk_id(entry) for entry in entries]
+        }
+    return manifest
+
+# sources that are new or changed (to add) and removed or changed (to delete)
+def diff_manifests(old, new):
+    old_sources = old["sources"]
+    new_sources = new["sources"]
+    to_add = [source for source in new_sources
+              if source not in old_sources or old_sources[source]["fingerprint"] != new_sources[source]["fingerprint"]]
+    to_delete = [source for source in old_sources
+                 if source not in new_sources or old_sources[source]["fingerprint"] != new_sources[source]["fingerprint"]]
+    return to_add, to_delete
+
+# apply only the difference between the manifest and the embedding store to one vector db
+def update_embeddings(config_name, embeddings, data, manifest, vector_db, collection_name, batch_size,
+                      faiss_index_type="flat", faiss_params=None, precision="float32"):
+    current = build_manifest(config_name, data)
+    to_add, to_delete = diff_manifests(manifest, current)
+    print(f"Incremental update: {len(to_add)} new/changed and "
+          f"{len(to_delete) - len(set(to_delete) & set(to_add))} removed documents")
+
+    add_sources = set(to_add)
+    positions = [i for i, entry in enumerate(data) if entry["source"] in add_sources]
+    new_embeddings = embeddings[positions]
+    new_data = [data[i] for i in positions]
+    stale_ids = [i for source in to_delete for i in manifest["sources"][source]["chunk_ids"]]
+
+    store = open_store(config_name, vector_db, collection_name, faiss_index_type, faiss_params)
+    start = time.perf_counter()
+    with span("index.update", vector_db=vector_db, config=config_name, upserts=len(new_data),
+              deletes=len(stale_ids)) as update_span:
+        if vector_db == "faiss":
+            store.load(mmap=False)
+        rebuild = vector_db == "faiss" and (store.index_type != faiss_index_type or not store.supports_removal)
+        if rebuild:
+            # only flat and sq indexes can remove rows; rebuild the rest from the stored matrix (no re-embedding)
+            store = open_store(config_name, vector_db, collection_name, faiss_index_type, faiss_params)
+            store.create(embeddings.shape[1], train_vectors=embeddings, precision=precision)
+            store.bulk_add(embeddings, data, batch_size)
+            written = len(data)
+        else:
+            store.delete(stale_ids, batch_size)
+            store.upsert(new_embeddings, new_data, batch_size)
+            written = len(new_data)
+        update_span.tag(rebuild=rebuild, written=written)
+        store.save()
+
+    elapsed = time.perf_counter() - start
+    if rebuild:
+        print(f"Rebuilt {vector_db} {faiss_index_type} index with {written} vectors "
+              f"({len(new_data)} new/changed, {len(stale_ids)} removed) in {elapsed:.2f}s")
+    else:
+        print(f"Upserted {written} and deleted {len(stale_ids)} vectors in {vector_db} in {elapsed:.2f}s")
+    save_manifest(store_namespace(config_name, vector_db, collection_name), vector_db, current)
+    mark_index_rebuilt(config_name, vector_db)
+    return written / max(elapsed, 1e-9)
+
+# whether the target store still holds the data a manifest describes
+def store_exists(config_name, vector_db, collection_name):
+    return open_store(config_name, vector_db, collection_name).exists()
 
 # load appropriate db with embeddings
-def load_and_store_embeddings(filepath, vector_db="faiss", collection_name=None):
+def load_and_store_embeddings(filepath, vector_db="faiss", collection_name=None, batch_size=500,
+                              incremental=False, faiss_index_type="flat", faiss_params=None):
     print(f"Loading embeddings from: {filepath}")
-    with open(filepath, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    embeddings, columns = load_embeddings(filepath)
+    data = metadata_rows(columns)
+    config_name = os.path.basename(store_stem(filepath))
+    precision = matrix_precision(embeddings)
 
-    if vector_db == "faiss":
-        embedding_dim = len(data[0]["embedding"])
-        if embedding_dim != VECTOR_DIM:
-            print(f"Warning: FAISS embedding dimension mismatch! Expected {VECTOR_DIM}, got {embedding_dim}")
-        reset_faiss_index(embedding_dim)
-
-    elif vector_db == "chroma":
-        embedding_dim = len(data[0]["embedding"])
-        collection = collection_name or "course_notes"
-
-        print(f"Creating Chroma collection: {collection} with dim={embedding_dim}")
-        chroma_collection = create_chroma_collection(embedding_dim, name=collection)
-
-    elif vector_db == "redis":
-        redis_client.flushdb()
-        try:
-            create_hnsw_index()
-        except Exception as e:
-            print(f"Failed to create Redis index: {e}")
-    else:
+    if vector_db not in ("faiss", "chroma", "redis"):
         raise ValueError(f"Unsupported vector DB: {vector_db}")
-
-    for i, entry in enumerate(data):
-        embedding = np.array(entry["embedding"], dtype=np.float32)
-
-        if vector_db == "faiss":
-            faiss_index.add(np.array([embedding]))
-            faiss_metadata.append(entry)
-
-        elif vector_db == "chroma":
-            chroma_collection.add(
-                documents=[entry["text"]],
-                embeddings=[embedding],
-                metadatas=[{
-                    "module": entry["module"],
-                    "slide_number": entry["slide_number"]
-                }],
-                ids=[entry.get("id", str(i))]
-            )
-
-
-        elif vector_db == "redis":
-            redis_client.hset(
-                f"{DOC_PREFIX}{i}",
-                mapping={
-                    "text": entry["text"],
-                    "module": entry["module"],
-                    "slide_number": entry["slide_number"],
-                    "embedding": embedding.tobytes()
-                }
-            )
\ No newline at end of file
+    if vector_db == "faiss":
+        # a float16 / int8 store keeps its footprint in faiss by swapping flat for a scalar-quantized index
+        faiss_index_type = faiss_index_for_precision(faiss_index_type, precision)
+
+    namespace = store_namespace(config_name, vector_db, collection_name)
+    if incremental:
+        manifest = load_manifest(namespace, vector_db)
+        if (manifest is not None and manifest.get("config") == config_name
+                and store_exists(config_name, vector_db, collection_name)):
+            return update_embeddings(config_name, embeddings, data, manifest, vector_db,
+                                     collection_name, batch_size, faiss_index_type, faiss_params, precision)
+        print(f"No existing {vector_db} manifest for {config_name}; running a full ingest")
+
+    embedding_dim = embeddings.shape[1]
+    if vector_db == "faiss" and embedding_dim != VECTOR_DIM:
+        print(f"Warning: FAISS embedding dimension mismatch! Expected {VECTOR_DIM}, got {embedding_dim}")
+    if vector_db == "chroma":
+        print(f"Creating Chroma collection: {namespace} with dim={embedding_dim}")
+
+    # start from an empty store: new faiss index, recreated chroma collection, redis index dropped with its docs
+    store = open_store(config_name, vector_db, collection_name, faiss_index_type, faiss_params)
+    store.create(embedding_dim, train_vectors=embeddings, precision=precision)
+
+    start = time.perf_counter()
+    with span("index.write", vector_db=vector_db, config=config_name, vectors=len(data), precision=precision):
+        store.bulk_add(embeddings, data, batch_size)
+
+    elapsed = time.perf_counter() - start
+    vectors_per_sec = len(data) / max(elapsed, 1e-9)
+    print(f"Indexed {len(data)} {precision} vectors into {vector_db} in {elapsed:.2f}s "
+          f"({vectors_per_sec:.1f} vectors/sec)")
+
+    store.save()
+    save_manifest(namespace, vector_db, build_manifest(config_name, data))
+    mark_index_rebuilt(config_name, vector_db)
+    return vectors_per_sec
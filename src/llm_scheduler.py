@@ -0,0 +1,149 @@
+import os
+import time
+import asyncio
+import threading
+import backends
+from query import stream_chat
+
+# generation slots per ollama host, waiting requests per host beyond those, and the default deadline
+LLM_CONCURRENCY = int(os.environ.get("RAG_LLM_CONCURRENCY", "2"))
+LLM_QUEUE_SIZE = int(os.environ.get("RAG_LLM_QUEUE_SIZE", "32"))
+LLM_TIMEOUT_SEC = float(os.environ.get("RAG_LLM_TIMEOUT_SEC", "120"))
+# model -> ollama host, e.g. "mistral=http://127.0.0.1:11434,llama2=http://gpu-box:11434,*=http://127.0.0.1:11434";
+# unrouted models use the ollama client's default host (OLLAMA_HOST)
+LLM_ROUTES = os.environ.get("RAG_LLM_ROUTES", "")
+
+# the host's queue is full; the caller should back off and retry
+class SchedulerBusy(RuntimeError):
+    pass
+
+# the request did not finish before its deadline (while queued or while generating)
+class DeadlineExceeded(TimeoutError):
+    pass
+
+def parse_routes(spec):
+    routes = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, host = item.partition("=")
+        routes[model.strip()] = host.strip() or None
+    return routes
+
+# one ollama host: its generation slots, waiting requests and counters
+class Lane:
+    def __init__(self, host, concurrency, queue_size):
+        self.host = host
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.slots = asyncio.Semaphore(concurrency)
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.failed = 0
+        self.queue_sec = 0.0
+        self._client = None
+
+    # the ollama module (default host) or a client bound to the routed host
+    @property
+    def client(self):
+        if self._client is None:
+            ollama = backends.get("ollama")
+            self._client = ollama if self.host is None else ollama.Client(host=self.host)
+        return self._client
+
+    def stats(self):
+        finished = self.completed + self.timed_out + self.failed
+        return {
+            "host": self.host or "default",
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "failed": self.failed,
+            "mean_queue_sec": self.queue_sec / finished if finished else 0.0
+        }
+
+# asyncio front door for llm calls: per-host concurrency limit, bounded wait queue and per-request deadline.
+# generation itself is the blocking stream_chat, run on `executor`
+class LLMScheduler:
+    def __init__(self, concurrency=LLM_CONCURRENCY, queue_size=LLM_QUEUE_SIZE, timeout_sec=LLM_TIMEOUT_SEC,
+                 routes=None, executor=None):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout_sec = timeout_sec
+        self.routes = parse_routes(LLM_ROUTES) if routes is None else dict(routes)
+        self.executor = executor
+        self.lanes = {}
+
+    # exact model name, then the name without its ":tag", then the "*" route
+    def route(self, model):
+        for key in (model, model.split(":")[0], "*"):
+            if key in self.routes:
+                return self.routes[key]
+        return None
+
+    def lane(self, model):
+        host = self.route(model)
+        if host not in self.lanes:
+            self.lanes[host] = Lane(host, self.concurrency, self.queue_size)
+        return self.lanes[host]
+
+    # full response for one chat request; timings land in `metrics` like query_llm's
+    async def chat(self, model, messages, metrics=None, timeout_sec=None):
+        metrics = {} if metrics is None else metrics
+        lane = self.lane(model)
+        if lane.waiting >= lane.queue_size:
+            lane.rejected += 1
+            raise SchedulerBusy(f"LLM queue for {lane.host or 'default host'} is full ({lane.queue_size} waiting)")
+
+        deadline = time.monotonic() + (timeout_sec if timeout_sec is not None else self.timeout_sec)
+        queued_at = time.monotonic()
+        lane.waiting += 1
+        try:
+            await asyncio.wait_for(lane.slots.acquire(), timeout=max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            lane.timed_out += 1
+            raise DeadlineExceeded(f"LLM request for {model} expired after waiting in the queue")
+        finally:
+            lane.waiting -= 1
+            lane.queue_sec += time.monotonic() - queued_at
+        metrics["queue_sec"] = time.monotonic() - queued_at
+
+        # the slot is held until the worker thread actually returns, so a timed-out request that is
+        # still draining its stream keeps counting against the concurrency limit
+        loop = asyncio.get_running_loop()
+        cancel_event = threading.Event()
+        lane.running += 1
+
+        def generate():
+            return "".join(stream_chat(model, messages, metrics=metrics, cancel_event=cancel_event,
+                                       client=lane.client))
+
+        def release(_):
+            lane.running -= 1
+            lane.slots.release()
+
+        future = loop.run_in_executor(self.executor, generate)
+        future.add_done_callback(release)
+        try:
+            response = await asyncio.wait_for(asyncio.shield(future), timeout=max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            cancel_event.set()
+            lane.timed_out += 1
+            raise DeadlineExceeded(f"LLM request for {model} did not finish before its deadline")
+        except asyncio.CancelledError:
+            # the caller went away; stop reading tokens nobody will see
+            cancel_event.set()
+            raise
+        except Exception:
+            lane.failed += 1
+            raise
+        lane.completed += 1
+        return response
+
+    def stats(self):
+        return {lane.host or "default": lane.stats() for lane in self.lanes.values()}
@@ -1,14 +1,17 @@
 import subprocess
 import os
-import json
 import argparse
 import indexing
+import tracing
+from embedding_store import config_name, SUPPORTED_DTYPES
+from embedding import EMBED_BACKENDS, default_backend
+from indexed_configs import record_indexed_config
+from vector_stores import FAISS_INDEX_TYPES, DEFAULT_FAISS_PARAMS
 
 # path setup
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 EMBEDDING_SCRIPT = os.path.join(PROJECT_ROOT, "src", "embedding.py")
 EMBEDDING_RESULTS_DIR = os.path.join(PROJECT_ROOT, "embedding_results")
-CONFIG_FILE = os.path.join(PROJECT_ROOT, "last_indexed_config.json")
 
 # define CLI arguments
 parser = argparse.ArgumentParser()
@@ -16,40 +19,72 @@ parser.add_argument("--model", default="all-MiniLM-L6-v2")
 parser.add_argument("--chunk_size", type=int, default=200)
 parser.add_argument("--overlap", type=int, default=50)
 parser.add_argument("--vector_db", choices=["faiss", "chroma", "redis"], default="redis")
+parser.add_argument("--dtype", choices=SUPPORTED_DTYPES, default="float32")
+parser.add_argument("--batch_size", type=int, default=64)
+parser.add_argument("--workers", type=int, default=0)
+parser.add_argument("--no_cache", action="store_true")
+parser.add_argument("--chunk_tokenizer", choices=["nltk", "model"], default="nltk")
+parser.add_argument("--embed_backend", choices=EMBED_BACKENDS, default=default_backend)
+parser.add_argument("--index_batch_size", type=int, default=500)
+parser.add_argument("--incremental", action="store_true",
+                    help="only upsert/delete chunks of new, changed or removed PDFs")
+parser.add_argument("--faiss_index", choices=FAISS_INDEX_TYPES, default="flat",
+                    help="flat = exact cosine; hnsw / ivf_flat / ivf_pq = approximate")
+parser.add_argument("--nlist", type=int, default=DEFAULT_FAISS_PARAMS["nlist"])
+parser.add_argument("--pq_m", type=int, default=DEFAULT_FAISS_PARAMS["pq_m"])
+parser.add_argument("--pq_nbits", type=int, default=DEFAULT_FAISS_PARAMS["pq_nbits"])
+parser.add_argument("--hnsw_m", type=int, default=DEFAULT_FAISS_PARAMS["hnsw_m"])
+parser.add_argument("--ef_construction", type=int, default=DEFAULT_FAISS_PARAMS["ef_construction"])
+parser.add_argument("--trace", help="export per-stage spans to this .json/.csv file (embedding spans go to <name>_embedding)")
 args = parser.parse_args()
 
 embedding_output_file = os.path.join(
     EMBEDDING_RESULTS_DIR,
-    f"{args.model.replace('/', '_')}__chunk{args.chunk_size}_overlap{args.overlap}.json"
+    config_name(args.model, args.chunk_size, args.overlap)
 )
 
 def main():
+    if args.trace:
+        tracing.enable()
+        trace_root, trace_ext = os.path.splitext(args.trace)
+
     # preprocess data and generate embeddings
     print("Preprocessing PDFs and generating embeddings...")
     subprocess.run([
         "python", EMBEDDING_SCRIPT,
         "--model", args.model,
         "--chunk_size", str(args.chunk_size),
-        "--overlap", str(args.overlap)
-    ], check=True)
+        "--overlap", str(args.overlap),
+        "--dtype", args.dtype,
+        "--batch_size", str(args.batch_size),
+        "--workers", str(args.workers),
+        "--chunk_tokenizer", args.chunk_tokenizer,
+        "--embed_backend", args.embed_backend
+    ] + (["--no_cache"] if args.no_cache else [])
+      + (["--trace", f"{trace_root}_embedding{trace_ext}"] if args.trace else []), check=True)
 
     # index into appropriate db
     print("Indexing into vector databases...")
-    indexing.create_hnsw_index()
-    indexing.load_and_store_embeddings(embedding_output_file, vector_db=args.vector_db)
-
-    # write metadata for future query use
-    config = {
-        "model": args.model,
-        "chunk_size": args.chunk_size,
-        "overlap": args.overlap,
-        "vector_dbs": [args.vector_db]
-    }
+    indexing.load_and_store_embeddings(embedding_output_file, vector_db=args.vector_db,
+                                       batch_size=args.index_batch_size,
+                                       incremental=args.incremental,
+                                       faiss_index_type=args.faiss_index,
+                                       faiss_params={
+                                           "nlist": args.nlist,
+                                           "pq_m": args.pq_m,
+                                           "pq_nbits": args.pq_nbits,
+                                           "hnsw_m": args.hnsw_m,
+                                           "ef_construction": args.ef_construction
+                                       })
 
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=2)
+    # record the config next to any others already indexed, for future query use
+    record_indexed_config(args.model, args.chunk_size, args.overlap, [args.vector_db])
 
     print("Vector databases loaded and ready for querying!")
 
+    if args.trace:
+        tracing.print_summary()
+        tracing.export(args.trace)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
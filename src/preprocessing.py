@@ -1,17 +1,20 @@
-import fitz
 import re
 import os
 import json
-from chunking import chunk_by_tokens
+import hashlib
+import backends
+from concurrent.futures import ProcessPoolExecutor
+from chunking import iter_chunk_spans
+import tracing
+from tracing import span
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+EXTRACTION_CACHE_DIR = os.path.join(PROJECT_ROOT, "extraction_cache")
 
 # generate text from pdfs with PyMuPDF
 def get_pdf_text(file_path):
-    pdf = fitz.open(file_path)
-    text = ""
-    for page in pdf:
-        page_text = page.get_text("text")
-        text += page_text + "\n"
-    return text
+    with backends.get("fitz").open(file_path) as pdf:
+        return "".join(page.get_text("text") + "\n" for page in pdf)
 
 # clean text
 def clean_text(text):
@@ -26,31 +29,93 @@ def clean_text(text):
 
 # generate and clean text from pdfs
 def process_pdf(file_path):
-    raw_text = get_pdf_text(file_path)
-    cleaned_text = clean_text(raw_text)
+    source = os.path.basename(file_path)
+    with span("get_pdf_text", source=source):
+        raw_text = get_pdf_text(file_path)
+    with span("clean_text", source=source):
+        cleaned_text = clean_text(raw_text)
+    return cleaned_text
+
+# cache file for a pdf, keyed by path, size and modification time
+def extraction_cache_path(file_path):
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return os.path.join(EXTRACTION_CACHE_DIR, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".txt")
+
+def read_cached_text(file_path):
+    cache_path = extraction_cache_path(file_path)
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+# extract and clean one pdf, then cache the cleaned text
+def process_pdf_cached(file_path):
+    cleaned_text = process_pdf(file_path)
+    cache_path = extraction_cache_path(file_path)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(cleaned_text)
+    os.replace(tmp_path, cache_path)
     return cleaned_text
 
+# pool task: cleaned text plus the trace spans this task recorded in the worker process
+def extract_pdf_task(file_path):
+    tracing.drain()  # spans inherited from the parent on fork
+    cleaned_text = process_pdf_cached(file_path)
+    return cleaned_text, tracing.drain()
+
+# cleaned text for every pdf, extracting only uncached files across a process pool
+def extract_folder(folder_path, workers=None):
+    if not os.path.exists(EXTRACTION_CACHE_DIR):
+        os.makedirs(EXTRACTION_CACHE_DIR)
+
+    filenames = sorted(f for f in os.listdir(folder_path) if f.lower().endswith(".pdf"))
+    texts = {}
+    pending = []
+    for filename in filenames:
+        cached = read_cached_text(os.path.join(folder_path, filename))
+        if cached is None:
+            pending.append(filename)
+        else:
+            texts[filename] = cached
+
+    if pending:
+        paths = [os.path.join(folder_path, filename) for filename in pending]
+        if workers == 1 or len(pending) == 1:
+            extracted = map(process_pdf_cached, paths)
+            texts.update(zip(pending, extracted))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for filename, (cleaned_text, worker_spans) in zip(pending, executor.map(extract_pdf_task, paths)):
+                    texts[filename] = cleaned_text
+                    tracing.extend(worker_spans)
+
+    print(f"Extracted {len(filenames)} PDFs ({len(filenames) - len(pending)} unchanged, from cache)")
+    return [(filename, texts[filename]) for filename in filenames]
+
 # generate, clean, and chunk text from pdfs appropriately
-def process_folder(folder_path, chunk_size=200, overlap=50, output_json="slides_metadata.json"):
+def process_folder(folder_path, chunk_size=200, overlap=50, output_json="slides_metadata.json", workers=None,
+                   tokenizer=None):
     all_chunks = []
-    for filename in os.listdir(folder_path):
-        if filename.lower().endswith(".pdf"):
-            file_path = os.path.join(folder_path, filename)
-            cleaned_text = process_pdf(file_path)
-            module_name = os.path.splitext(filename)[0]
-            chunks = chunk_by_tokens(cleaned_text, chunk_size, overlap)
-            for i, chunk in enumerate(chunks):
+    for filename, cleaned_text in extract_folder(folder_path, workers=workers):
+        module_name = os.path.splitext(filename)[0]
+        with span("chunk_by_tokens", source=filename, chunk_size=chunk_size, overlap=overlap):
+            chunk_spans = iter_chunk_spans(cleaned_text, chunk_size, overlap, tokenizer)
+            for i, (start, end) in enumerate(chunk_spans):
                 all_chunks.append({
                     "slide_number": i + 1,
-                    "text": chunk,
+                    "text": cleaned_text[start:end],
                     "module": module_name,
-                    "source": filename
+                    "source": filename,
+                    "start_char": start,
+                    "end_char": end
                 })
 
     with open(output_json, "w", encoding="utf-8") as f:
         json.dump(all_chunks, f, indent=4)
 
-    return {chunk["source"]: chunk["text"] for chunk in all_chunks}  # to support .items() in main
+    return all_chunks
 
 if __name__ == "__main__":
     PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -1,23 +1,128 @@
 import os
-import json
+import time
+import asyncio
 import numpy as np
-import ollama
-from embedding import get_model, get_embedding
-from indexing import redis_client, INDEX_NAME
-from redis.commands.search.query import Query
-import faiss
-import chromadb
+import backends
+from embedding import get_model, get_embeddings, cache_model_name
+from embedding_store import config_name
+from query_cache import MISSING, embedding_cache, retrieval_cache, llm_cache, llm_cache_key, index_version
+import tracing
+from tracing import span
+import indexing
+from vector_stores import filter_key, faiss_index_paths
+from index_manager import open_index
+from context_builder import build_context
 
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# ollama generation options; num_thread is the server's cpu threads per request (RAG_LLM_NUM_THREADS)
+LLM_OPTIONS = {"num_predict": 256, "num_thread": int(os.environ.get("RAG_LLM_NUM_THREADS", "14"))}
 
-# for FAISS metadata tracking
-faiss_metadata = []
+# open the persisted faiss index for a config (memory-mapped where supported) and keep it resident
+def load_faiss_index(embed_model, chunk_size, overlap):
+    name = config_name(embed_model, chunk_size, overlap)
+    index_path, _ = faiss_index_paths(name)
 
-# reset faiss index
-def reset_faiss_index(dimension):
-    global faiss_index, faiss_metadata
-    faiss_index = faiss.IndexFlatL2(dimension)
-    faiss_metadata = []
+    # build the index once from the embedding file if it was never persisted
+    if not os.path.exists(index_path):
+        embedding_stem = os.path.join(PROJECT_ROOT, "embedding_results", name)
+        indexing.load_and_store_embeddings(embedding_stem, vector_db="faiss")
 
+    # reuse the resident copy unless the index was rebuilt since it was opened or evicted for other configs
+    return open_index("faiss", name)
+
+# question embeddings, encoding only questions not seen before for this model and embed backend
+def embed_questions(questions, embed_model, batch_size=64):
+    model_key = cache_model_name(embed_model)
+    cached = [embedding_cache.get((model_key, question)) for question in questions]
+    missing = list(dict.fromkeys(q for q, vec in zip(questions, cached) if vec is MISSING))
+
+    encoded = {}
+    if missing:
+        # Embed all new questions in one batched call
+        with span("query.embed", model=embed_model, questions=len(missing)):
+            vectors = get_embeddings(missing, get_model(embed_model), batch_size=batch_size)
+        for question, vec in zip(missing, vectors):
+            embedding_cache.put((model_key, question), vec)
+            encoded[question] = vec
+
+    rows = [encoded[q] if vec is MISSING else vec for q, vec in zip(questions, cached)]
+    return np.vstack(rows).astype(np.float32, copy=False)
+
+# search the vector db for many questions at once, bypassing the retrieval cache
+def search_vector_db_batch(
+    questions,
+    embed_model="all-MiniLM-L6-v2",
+    vector_db="faiss",
+    chunk_size=200,
+    overlap=0,
+    top_k=3,
+    batch_size=64,
+    nprobe=None,
+    ef_search=None,
+    filters=None
+):
+    # every store keeps one index per embedding model / chunk size / overlap, named after the config
+    if vector_db == "faiss":
+        store = load_faiss_index(embed_model, chunk_size, overlap)
+    elif vector_db in ("chroma", "redis"):
+        store = open_index(vector_db, config_name(embed_model, chunk_size, overlap))
+    else:
+        raise ValueError(f"Unsupported vector DB: {vector_db}")
+
+    query_vecs = embed_questions(questions, embed_model, batch_size=batch_size)
+    return store.search_batch(query_vecs, top_k, filters=filters, nprobe=nprobe, ef_search=ef_search)
+
+# cached results per question (MISSING where not cached) and the distinct questions still to search
+def cached_retrievals(questions, vector_db, name, search_key):
+    # cached retrievals are keyed on the index build, so a rebuild never serves stale chunks
+    version = index_version(name, vector_db)
+    results = [retrieval_cache.get((vector_db, name, version, search_key, q)) for q in questions]
+    missing = list(dict.fromkeys(q for q, result in zip(questions, results) if result is MISSING))
+    return version, results, missing
+
+# retrieve top_k chunks for many questions at once; results come back per question, in order
+# `filters` ({"module": [...], "source": [...]}) is pushed down into the store's own search
+def query_vector_db_batch(
+    questions,
+    embed_model="all-MiniLM-L6-v2",
+    vector_db="faiss",
+    chunk_size=200,
+    overlap=0,
+    top_k=3,
+    batch_size=64,
+    nprobe=None,
+    ef_search=None,
+    filters=None
+):
+    questions = list(questions)
+    if not questions:
+        return []
+    if vector_db not in ("faiss", "chroma", "redis"):
+        raise ValueError(f"Unsupported vector DB: {vector_db}")
+
+    name = config_name(embed_model, chunk_size, overlap)
+    # the backend's question vectors can retrieve different chunks, so it is part of the key
+    search_key = (cache_model_name(embed_model), top_k, nprobe, ef_search, filter_key(filters))
+    version, results, missing = cached_retrievals(questions, vector_db, name, search_key)
+    if missing:
+        with span("query.search", vector_db=vector_db, config=name, questions=len(missing), top_k=top_k):
+            fetched = dict(zip(missing, search_vector_db_batch(
+                missing,
+                embed_model=embed_model,
+                vector_db=vector_db,
+                chunk_size=chunk_size,
+                overlap=overlap,
+                top_k=top_k,
+                batch_size=batch_size,
+                nprobe=nprobe,
+                ef_search=ef_search,
+                filters=filters
+            )))
+        for question, result in fetched.items():
+            retrieval_cache.put((vector_db, name, version, search_key, question), result)
+        results = [fetched[q] if result is MISSING else result for q, result in zip(questions, results)]
+
+    return [list(result) for result in results]
 
 def query_vector_db(
     question,
@@ -25,112 +130,196 @@ def query_vector_db(
     vector_db="faiss",
     chunk_size=200,
     overlap=0,
-    top_k=3
+    top_k=3,
+    nprobe=None,
+    ef_search=None,
+    filters=None
 ):
-    # Embed the question
-    model = get_model(embed_model)
-    query_vec = get_embedding(question, model)
+    return query_vector_db_batch(
+        [question],
+        embed_model=embed_model,
+        vector_db=vector_db,
+        chunk_size=chunk_size,
+        overlap=overlap,
+        top_k=top_k,
+        nprobe=nprobe,
+        ef_search=ef_search,
+        filters=filters
+    )[0]
 
-    # faiss retrieval
-    if vector_db == "faiss":
-        # Load relevant embedding file
-        PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-        embedding_file = os.path.join(
-            PROJECT_ROOT,
-            "embedding_results",
-            f"{embed_model.replace('/', '_')}__chunk{chunk_size}_overlap{overlap}.json"
-        )
-
-        with open(embedding_file, "r", encoding="utf-8") as f:
-            entries = json.load(f)
-
-        # reset and rebuild FAISS index
-        reset_faiss_index(len(entries[0]["embedding"]))
-
-        for entry in entries:
-            emb = np.array(entry["embedding"], dtype=np.float32)
-            faiss_index.add(np.array([emb]))
-            faiss_metadata.append(entry)
-
-        D, I = faiss_index.search(np.array([query_vec], dtype=np.float32), top_k)
-        results = [faiss_metadata[i] for i in I[0]]
-        return results
-
-    # chroma retrieval
-    elif vector_db == "chroma":
-        chroma_client = chromadb.PersistentClient(path="./vector_storage")
-
-        # Determine collection name based on embedding model, chunk, and overlap
-        collection_name = f"{embed_model.replace('/', '_')}__chunk{chunk_size}_overlap{overlap}"
-        print(f"Querying Chroma collection: {collection_name}")
-
-        chroma_collection = chroma_client.get_or_create_collection(collection_name)
-
-        query_results = chroma_collection.query(
-            query_texts=[question],
-            n_results=top_k
-        )
-
-        results = []
-        for doc, meta in zip(query_results["documents"][0], query_results["metadatas"][0]):
-            results.append({
-                "text": doc,
-                "module": meta.get("module", "N/A"),
-                "slide_number": meta.get("slide_number", "N/A")
-            })
-        return results
-
-
-    # redis retrieval
-    elif vector_db == "redis":
-        redis_query = (
-            Query(f"*=>[KNN {top_k} @embedding $vec AS score]")
-            .sort_by("score")
-            .return_fields("text", "module", "slide_number", "score")
-            .dialect(2)
-        )
-        redis_results = redis_client.ft(INDEX_NAME).search(
-            redis_query,
-            query_params={"vec": np.array(query_vec, dtype=np.float32).tobytes()}
-        )
-        results = []
-        for doc in redis_results.docs:
-            results.append({
-                "text": doc.text,
-                "module": doc.module,
-                "slide_number": doc.slide_number
-            })
-        return results
+# asyncio retrieval: redis searches go through the async connection pool, everything else runs on `executor`
+async def query_vector_db_async(
+    question,
+    embed_model="all-MiniLM-L6-v2",
+    vector_db="faiss",
+    chunk_size=200,
+    overlap=0,
+    top_k=3,
+    nprobe=None,
+    ef_search=None,
+    filters=None,
+    executor=None
+):
+    loop = asyncio.get_running_loop()
+    if vector_db != "redis":
+        return await loop.run_in_executor(executor, lambda: query_vector_db(
+            question, embed_model=embed_model, vector_db=vector_db, chunk_size=chunk_size, overlap=overlap,
+            top_k=top_k, nprobe=nprobe, ef_search=ef_search, filters=filters
+        ))
 
-    else:
-        raise ValueError(f"Unsupported vector DB: {vector_db}")
+    name = config_name(embed_model, chunk_size, overlap)
+    search_key = (cache_model_name(embed_model), top_k, nprobe, ef_search, filter_key(filters))
+    version, results, missing = cached_retrievals([question], vector_db, name, search_key)
+    if not missing:
+        return list(results[0])
+
+    # the model forward pass is cpu-bound, so only the redis round trip stays on the event loop
+    query_vecs = await loop.run_in_executor(executor, embed_questions, [question], embed_model)
+    result = (await open_index("redis_async", name).search_batch(query_vecs, top_k, filters=filters))[0]
+    retrieval_cache.put((vector_db, name, version, search_key, question), result)
+    return list(result)
+
+# build messages for the chat model from the question and retrieved chunks
+# overlapping chunks are merged and the context is packed into the model's token budget; `report` gets the savings
+def build_messages(question, contexts, system_prompt, model=None, token_budget=None, report=None):
+    with span("query.prompt", contexts=len(contexts), model=model) as prompt_span:
+        context, context_report = build_context(contexts, model=model, token_budget=token_budget)
+        prompt_span.tag(tokens=context_report["context_tokens"], tokens_saved=context_report["context_tokens_saved"])
+    if report is not None:
+        report.update(context_report)
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"{question}\n\nCourse Material:\n{context}"}
+    ]
+
+# stream tokens from the local LLM as they arrive; timing lands in `metrics` even if cancelled
+# `client` is an ollama.Client for a routed host; by default the ollama module's own client is used
+def stream_chat(model, messages, metrics=None, cancel_event=None, client=None):
+    metrics = {} if metrics is None else metrics
+    start = time.perf_counter()
+    first_token_at = None
+    final = None
+    tokens = 0
+
+    stream = (client or backends.get("ollama")).chat(model=model,
+                                         messages=messages,
+                                         options=LLM_OPTIONS,
+                                         stream=True
+                                         )
+    try:
+        for chunk in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            content = chunk["message"]["content"]
+            if content:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                tokens += 1
+                yield content
+            if chunk.get("done"):
+                final = chunk
+    finally:
+        # stop reading from ollama when the caller cancels or closes the generator
+        if hasattr(stream, "close"):
+            stream.close()
+
+        end = time.perf_counter()
+        metrics["total_sec"] = end - start
+        metrics["ttft_sec"] = first_token_at - start if first_token_at is not None else None
+        metrics["cancelled"] = final is None
+        metrics["eval_tokens"] = tokens
+        if final is not None and final.get("eval_duration"):
+            # server-side timings separate prompt prefill from decode
+            metrics["prompt_tokens"] = final.get("prompt_eval_count")
+            metrics["prompt_eval_sec"] = (final.get("prompt_eval_duration") or 0) / 1e9
+            metrics["eval_tokens"] = final.get("eval_count") or tokens
+            metrics["tokens_per_sec"] = metrics["eval_tokens"] / (final["eval_duration"] / 1e9)
+        elif first_token_at is not None and tokens > 1:
+            metrics["tokens_per_sec"] = (tokens - 1) / max(end - first_token_at, 1e-9)
+
+        # prefill is server-reported when available, otherwise time to first token
+        prefill_sec = metrics.get("prompt_eval_sec", metrics["ttft_sec"])
+        tracing.record("llm.generate", metrics["total_sec"], model=model, tokens=metrics["eval_tokens"],
+                       cancelled=metrics["cancelled"])
+        if prefill_sec is not None:
+            tracing.record("llm.prefill", prefill_sec, parent="llm.generate", model=model)
+            tracing.record("llm.decode", end - (first_token_at or end), parent="llm.generate", model=model,
+                           tokens=metrics["eval_tokens"])
+
+# stream an answer token by token: retrieval first, then generation
+def stream_llm(question, source="redis", model="mistral", top_k=5,
+               embed_model="all-MiniLM-L6-v2", chunk_size=200, overlap=0,
+               system_prompt="You are a helpful assistant. Use the provided course material to answer the question.",
+               metrics=None, cancel_event=None, filters=None, token_budget=None):
+    metrics = {} if metrics is None else metrics
+    contexts = query_vector_db(
+        question=question,
+        embed_model=embed_model,
+        vector_db=source,
+        chunk_size=chunk_size,
+        overlap=overlap,
+        top_k=top_k,
+        filters=filters
+    )
+    messages = build_messages(question, contexts, system_prompt, model=model, token_budget=token_budget, report=metrics)
+    yield from stream_chat(model, messages, metrics=metrics, cancel_event=cancel_event)
 
 # query appropriate llm with appropriate question
 def query_llm(question, source="redis", model="mistral", top_k=5, 
               embed_model="all-MiniLM-L6-v2", chunk_size=200, overlap=0,
-              system_prompt="You are a helpful assistant. Use the provided course material to answer the question."):
+              system_prompt="You are a helpful assistant. Use the provided course material to answer the question.",
+              metrics=None, filters=None, token_budget=None):
+    metrics = {} if metrics is None else metrics
     contexts = query_vector_db(
         question=question,
         embed_model=embed_model,
         vector_db=source,
         chunk_size=chunk_size,
         overlap=overlap,
-        top_k=top_k
+        top_k=top_k,
+        filters=filters
     )
+    messages = build_messages(question, contexts, system_prompt, model=model, token_budget=token_budget, report=metrics)
 
-    # assemble context for the prompt
-    context = "\n\n".join([chunk["text"] for chunk in contexts])
+    # identical prompts to the same model reuse the earlier answer
+    cache_key = llm_cache_key(model, messages)
+    response = llm_cache.get(cache_key)
+    metrics["cached"] = response is not MISSING
+    if response is not MISSING:
+        return response
 
-    # build messages for the chat model
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"{question}\n\nCourse Material:\n{context}"}
-    ]
+    response = "".join(stream_chat(model, messages, metrics=metrics))
+    if not metrics.get("cancelled"):
+        llm_cache.put(cache_key, response)
+    return response
+
+# asyncio query_llm for the query server: retrieval as in query_vector_db_async, generation through `scheduler`
+# (an llm_scheduler.LLMScheduler) so concurrent requests are queued, bounded and given deadlines
+async def query_llm_async(question, scheduler, source="redis", model="mistral", top_k=5,
+                          embed_model="all-MiniLM-L6-v2", chunk_size=200, overlap=0,
+                          system_prompt="You are a helpful assistant. Use the provided course material to answer the question.",
+                          metrics=None, filters=None, token_budget=None, timeout_sec=None, executor=None):
+    metrics = {} if metrics is None else metrics
+    contexts = await query_vector_db_async(
+        question,
+        embed_model=embed_model,
+        vector_db=source,
+        chunk_size=chunk_size,
+        overlap=overlap,
+        top_k=top_k,
+        filters=filters,
+        executor=executor
+    )
+    messages = build_messages(question, contexts, system_prompt, model=model, token_budget=token_budget, report=metrics)
 
-    # call the local LLM
-    response = ollama.chat(model=model, 
-                            messages=messages,
-                            options={"num_predict": 256, "num_threads": 14}
-                            )
+    cache_key = llm_cache_key(model, messages)
+    response = llm_cache.get(cache_key)
+    metrics["cached"] = response is not MISSING
+    if response is not MISSING:
+        return response
 
-    return response["message"]["content"]
\ No newline at end of file
+    response = await scheduler.chat(model, messages, metrics=metrics, timeout_sec=timeout_sec)
+    if not metrics.get("cancelled"):
+        llm_cache.put(cache_key, response)
+    return response
@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+INDEX_VERSIONS_FILE = os.path.join(PROJECT_ROOT, "index_versions.json")
+
+# returned by TTLCache.get on a miss, since None can be a cached value
+MISSING = object()
+
+# bounded in-memory cache with per-entry ttl and lru eviction
+class TTLCache:
+    def __init__(self, max_entries=1024, ttl_sec=3600):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or (self.ttl_sec is not None and time.monotonic() - entry[0] > self.ttl_sec):
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return MISSING
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    # drop every entry whose key matches
+    def invalidate(self, predicate):
+        with self.lock:
+            for key in [key for key in self.entries if predicate(key)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+# question text -> embedding, per embedding model
+embedding_cache = TTLCache(max_entries=4096, ttl_sec=None)
+# (vector db, config, index version, search settings, question) -> retrieved chunks
+retrieval_cache = TTLCache(max_entries=4096, ttl_sec=3600)
+# (llm model, system prompt, full prompt hash) -> response
+llm_cache = TTLCache(max_entries=1024, ttl_sec=3600)
+
+# resize or disable (max_entries=0) all three levels
+def configure_caches(max_entries=None, ttl_sec=None):
+    for cache in (embedding_cache, retrieval_cache, llm_cache):
+        if max_entries is not None:
+            cache.max_entries = max_entries
+        if ttl_sec is not None and cache is not embedding_cache:
+            cache.ttl_sec = ttl_sec
+        cache.clear()
+
+def cache_stats():
+    return {
+        "embedding": embedding_cache.stats(),
+        "retrieval": retrieval_cache.stats(),
+        "llm": llm_cache.stats()
+    }
+
+def llm_cache_key(model, messages):
+    system_prompt = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+    prompt_hash = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()
+    return (model, system_prompt, prompt_hash)
+
+# index versions are stamped by indexing so caches in other processes notice rebuilds
+_versions = {"mtime": None, "versions": {}}
+_versions_lock = threading.Lock()
+
+def mark_index_rebuilt(config_name, vector_db):
+    with _versions_lock:
+        versions = {}
+        if os.path.exists(INDEX_VERSIONS_FILE):
+            with open(INDEX_VERSIONS_FILE, "r", encoding="utf-8") as f:
+                versions = json.load(f)
+        versions[f"{vector_db}:{config_name}"] = time.time()
+
+        tmp_path = f"{INDEX_VERSIONS_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(versions, f, indent=2)
+        os.replace(tmp_path, INDEX_VERSIONS_FILE)
+
+# current build stamp of an index; purges cached retrievals for it when it changes
+def index_version(config_name, vector_db):
+    with _versions_lock:
+        mtime = os.path.getmtime(INDEX_VERSIONS_FILE) if os.path.exists(INDEX_VERSIONS_FILE) else None
+        if mtime != _versions["mtime"]:
+            previous = _versions["versions"]
+            versions = {}
+            if mtime is not None:
+                with open(INDEX_VERSIONS_FILE, "r", encoding="utf-8") as f:
+                    versions = json.load(f)
+            for name, version in versions.items():
+                if previous.get(name) != version:
+                    db, _, config = name.partition(":")
+                    retrieval_cache.invalidate(lambda key: key[0] == db and key[1] == config)
+            _versions["mtime"] = mtime
+            _versions["versions"] = versions
+        return _versions["versions"].get(f"{vector_db}:{config_name}")
@@ -0,0 +1,92 @@
+import argparse
+import http.client
+import json
+import socket
+import sys
+import time
+from indexed_configs import latest_indexed_config
+
+# http connection over a unix domain socket
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+# post a json request to the query server and return the decoded reply
+def post(path, payload, host="127.0.0.1", port=8765, socket_path=None, timeout=None):
+    if socket_path:
+        conn = UnixHTTPConnection(socket_path, timeout=timeout)
+    else:
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    try:
+        conn.request("POST", path, body=json.dumps(payload), headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        reply = json.loads(response.read() or b"{}")
+    finally:
+        conn.close()
+
+    if response.status != 200:
+        raise RuntimeError(f"Query server error {response.status}: {reply.get('error')}")
+    return reply
+
+if __name__ == "__main__":
+    # try to read defaults from config file
+    default_model = "all-MiniLM-L6-v2"
+    default_chunk_size = 200
+    default_overlap = 50
+    default_source = "redis"
+
+    try:
+        # the most recently indexed config supplies the defaults
+        config = latest_indexed_config() or {}
+        default_model = config.get("model", default_model)
+        default_chunk_size = config.get("chunk_size", default_chunk_size)
+        default_overlap = config.get("overlap", default_overlap)
+        vector_dbs = config.get("vector_dbs", [])
+        if default_source not in vector_dbs and vector_dbs:
+            default_source = vector_dbs[0]
+    except Exception as e:
+        print(f"Failed to read config file: {e}")
+
+    # define CLI arguments (same as test_query.py, plus where the server lives)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--question", default="What are ACID properties in databases?")
+    parser.add_argument("--source", default=default_source)
+    parser.add_argument("--llm_model", default="mistral")
+    parser.add_argument("--system_prompt", default="You are a helpful assistant. Use the provided course material to answer the question.")
+    parser.add_argument("--model")
+    parser.add_argument("--chunk_size", type=int)
+    parser.add_argument("--overlap", type=int)
+    parser.add_argument("--modules", nargs="+", help="only retrieve chunks from these modules")
+    parser.add_argument("--sources", nargs="+", help="only retrieve chunks from these pdf files")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", help="unix socket of the query server")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    reply = post("/query", {
+        "question": args.question,
+        "source": args.source,
+        "model": args.llm_model,
+        "system_prompt": args.system_prompt,
+        "embed_model": args.model or default_model,
+        "chunk_size": args.chunk_size if args.chunk_size is not None else default_chunk_size,
+        "overlap": args.overlap if args.overlap is not None else default_overlap,
+        "filters": {"module": args.modules, "source": args.sources}
+    }, host=args.host, port=args.port, socket_path=args.socket)
+    end_time = time.time()
+
+    #display response
+    print("<LLM_RESPONSE>")
+    print(reply["response"])
+    print("</LLM_RESPONSE>")
+    print(f"\nQuery completed in {end_time - start_time:.2f} seconds (server time {reply['elapsed_sec']:.2f}s).")
+
+    # flush output
+    sys.stdout.flush()
@@ -0,0 +1,141 @@
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from http_util import read_request, write_json
+from embedding import get_model, set_backend, EMBED_BACKENDS, default_backend
+from query import query_llm_async, query_vector_db_async, load_faiss_index
+from llm_scheduler import LLMScheduler, SchedulerBusy, DeadlineExceeded, LLM_CONCURRENCY, LLM_QUEUE_SIZE, LLM_TIMEOUT_SEC
+from query_cache import cache_stats
+from vector_stores import store_stats
+from index_manager import manager, INDEX_BUDGET_MB
+from indexed_configs import load_indexed_configs
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# request fields forwarded to query_llm / query_vector_db
+QUERY_FIELDS = {
+    "question", "source", "model", "top_k", "embed_model", "chunk_size", "overlap", "system_prompt", "filters",
+    "token_budget", "timeout_sec"
+}
+RETRIEVE_FIELDS = {
+    "question", "vector_db", "top_k", "embed_model", "chunk_size", "overlap", "nprobe", "ef_search", "filters"
+}
+
+# load embedding models and faiss indexes before the first request arrives
+def warm_up(embed_models, configs):
+    for embed_model in embed_models:
+        print(f"Loading embedding model: {embed_model}")
+        get_model(embed_model)
+
+    for config in configs:
+        if "faiss" in config.get("vector_dbs", []):
+            print(f"Loading FAISS index: {config['model']} | chunk={config['chunk_size']}, overlap={config['overlap']}")
+            load_faiss_index(config["model"], config["chunk_size"], config["overlap"])
+
+# configs to preload: every indexed config (faiss indexes beyond the memory budget are evicted again)
+def default_configs():
+    return load_indexed_configs()
+
+# serve one http request; blocking retrieval runs on the thread pool, generation goes through the llm scheduler
+async def handle_request(reader, writer, executor, scheduler):
+    try:
+        request = await read_request(reader)
+        if request is None:
+            return
+        method, path, _, body = request
+
+        if method == "GET" and path == "/health":
+            await write_json(writer, 200, {"status": "ok"})
+            return
+        if method == "GET" and path == "/stats":
+            stores = await asyncio.get_running_loop().run_in_executor(executor, store_stats)
+            await write_json(writer, 200, {"caches": cache_stats(), "stores": stores, "indexes": manager.stats(),
+                                           "llm": scheduler.stats()})
+            return
+        if method != "POST" or path not in ("/query", "/retrieve"):
+            await write_json(writer, 404, {"error": f"Unknown endpoint: {method} {path}"})
+            return
+
+        params = json.loads(body or b"{}")
+        if not params.get("question"):
+            await write_json(writer, 400, {"error": "Missing question"})
+            return
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        if path == "/query":
+            kwargs = {key: value for key, value in params.items() if key in QUERY_FIELDS}
+            llm_metrics = {}
+            response = await query_llm_async(**kwargs, scheduler=scheduler, metrics=llm_metrics, executor=executor)
+            payload = {"response": response, "llm_metrics": llm_metrics}
+        else:
+            kwargs = {key: value for key, value in params.items() if key in RETRIEVE_FIELDS}
+            results = await query_vector_db_async(**kwargs, executor=executor)
+            payload = {"results": results}
+
+        payload["elapsed_sec"] = round(time.perf_counter() - start, 4)
+        await write_json(writer, 200, payload)
+
+    except SchedulerBusy as e:
+        await write_json(writer, 503, {"error": str(e)})
+    except DeadlineExceeded as e:
+        await write_json(writer, 504, {"error": str(e)})
+    except (ValueError, TypeError) as e:
+        await write_json(writer, 400, {"error": str(e)})
+    except Exception as e:
+        await write_json(writer, 500, {"error": f"{type(e).__name__}: {e}"})
+    finally:
+        writer.close()
+
+async def serve(host, port, socket_path, workers, llm_concurrency, llm_queue_size, llm_timeout):
+    executor = ThreadPoolExecutor(max_workers=workers)
+    # generation threads come from their own pool so queued llm calls never starve retrieval
+    scheduler = LLMScheduler(llm_concurrency, llm_queue_size, llm_timeout, executor=ThreadPoolExecutor())
+
+    async def handler(reader, writer):
+        await handle_request(reader, writer, executor, scheduler)
+
+    if socket_path:
+        server = await asyncio.start_unix_server(handler, path=socket_path)
+        print(f"Query server listening on unix socket {socket_path}")
+    else:
+        server = await asyncio.start_server(handler, host, port)
+        print(f"Query server listening on http://{host}:{port}")
+
+    async with server:
+        await server.serve_forever()
+
+def main():
+    # define CLI arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", help="serve on a unix socket instead of tcp")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent retrieval/generation threads")
+    parser.add_argument("--embed_models", nargs="*", help="embedding models to preload")
+    parser.add_argument("--embed_backend", choices=EMBED_BACKENDS, default=default_backend,
+                        help="torch, onnx or onnx_int8 for question embeddings")
+    parser.add_argument("--index_budget_mb", type=float, default=INDEX_BUDGET_MB,
+                        help="memory for resident FAISS indexes; least recently used configs are evicted")
+    parser.add_argument("--llm_concurrency", type=int, default=LLM_CONCURRENCY, help="generations in flight per ollama host")
+    parser.add_argument("--llm_queue_size", type=int, default=LLM_QUEUE_SIZE, help="waiting llm requests before 503s")
+    parser.add_argument("--llm_timeout", type=float, default=LLM_TIMEOUT_SEC, help="per-request deadline in seconds")
+    args = parser.parse_args()
+    set_backend(args.embed_backend)
+    manager.budget_bytes = args.index_budget_mb * 1024 * 1024
+
+    configs = default_configs()
+    embed_models = args.embed_models or list(dict.fromkeys(config["model"] for config in configs))
+    warm_up(embed_models, configs)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.socket, args.workers,
+                          args.llm_concurrency, args.llm_queue_size, args.llm_timeout))
+    except KeyboardInterrupt:
+        print("Query server stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import os
+import csv
+import json
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmark_results")
+
+# write benchmark rows to <output>.json and <output>.csv; csv columns are `fields`, or every key in order of
+# first appearance so rows with extra keys (e.g. an error) still fit
+def write_results(results, output, label="benchmark", fields=None):
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    if fields is None:
+        fields = list(dict.fromkeys(key for row in results for key in row))
+    with open(f"{output}.json", "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    with open(f"{output}.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"Saved {len(results)} {label} rows to {output}.json and {output}.csv")
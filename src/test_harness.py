@@ -1,50 +1,110 @@
 import time
 import csv
 import os
-import subprocess
-import re
+import json
+import hashlib
+import argparse
+import threading
 import psutil
+import tracing
 from datetime import datetime
 from itertools import product
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import indexing
+from embedding import run_embedding_pipeline
+from embedding_store import config_name
+from indexed_configs import record_indexed_config
+from query import query_llm
+from query_cache import configure_caches
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 LOG_DIR = os.path.join(PROJECT_ROOT, "experiment_logs")
 OUTPUT_DIR = os.path.join(PROJECT_ROOT, "llm_outputs")
-CONFIG_FILE = os.path.join(PROJECT_ROOT, "last_indexed_config.json")
+EMBEDDING_RESULTS_DIR = os.path.join(PROJECT_ROOT, "embedding_results")
+CHECKPOINT_FILE = os.path.join(LOG_DIR, "grid_checkpoint.json")
 LOG_FILE = None
 LLM_OUTPUT_FILE = os.path.join(OUTPUT_DIR, f"llm_outputs_grid_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
 
+LOG_FIELDS = [
+    "exp_id", "embed_model", "chunk_size", "overlap", "vector_db", "llm_model", "question", "system_prompt",
+    "embedding_and_index_time_sec", "embedding_and_index_memory_mb", "query_time_sec", "query_memory_mb",
+    "llm_ttft_sec", "llm_prompt_eval_sec", "llm_tokens_per_sec", "context_tokens", "context_tokens_saved",
+    "total_runtime_sec", "llm_response_summary"
+]
+
 if not os.path.exists(OUTPUT_DIR):
     os.makedirs(OUTPUT_DIR)
 
+# csv log and llm output file stay open for the whole grid; workers share them under a lock
+log_lock = threading.Lock()
+log_handles = {}
+
 # log data from an experiment into log file
 def log_result(row: dict):
     global LOG_FILE
 
-    if not os.path.exists(LOG_DIR):
-        os.makedirs(LOG_DIR)
+    with log_lock:
+        if "csv" not in log_handles:
+            if not os.path.exists(LOG_DIR):
+                os.makedirs(LOG_DIR)
+            if not LOG_FILE:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                LOG_FILE = os.path.join(LOG_DIR, f"rag_test_results_{timestamp}.csv")
 
-    if not LOG_FILE:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        LOG_FILE = os.path.join(LOG_DIR, f"rag_test_results_{timestamp}.csv")
-        with open(LOG_FILE, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=row.keys())
-            writer.writeheader()
+            write_header = not os.path.exists(LOG_FILE)
+            f = open(LOG_FILE, "a", newline="", encoding="utf-8")
+            writer = csv.DictWriter(f, fieldnames=LOG_FIELDS)
+            if write_header:
+                writer.writeheader()
+            log_handles["csv"] = (f, writer)
 
-    with open(LOG_FILE, "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=row.keys())
+        f, writer = log_handles["csv"]
         writer.writerow(row)
+        f.flush()
+
+    print(f"Logged experiment {row['exp_id']} to CSV.")
+
+# append a full llm response to the shared output file
+def save_llm_output(text):
+    with log_lock:
+        if "llm" not in log_handles:
+            log_handles["llm"] = open(LLM_OUTPUT_FILE, "a", encoding="utf-8")
+        log_handles["llm"].write(text)
+        log_handles["llm"].flush()
+
+def close_logs():
+    with log_lock:
+        for handle in log_handles.values():
+            (handle[0] if isinstance(handle, tuple) else handle).close()
+        log_handles.clear()
+
+def rss_mb():
+    return psutil.Process().memory_info().rss / 1024 / 1024
 
-    print("Logged experiment to CSV.")
+# run fn while a thread samples rss; returns its result and the peak rss growth over the start in mb
+def run_with_peak_rss(fn, *args, interval_sec=0.05, **kwargs):
+    baseline = rss_mb()
+    peak = [baseline]
+    done = threading.Event()
 
-# store previous time and memory for reuse
-last_time = None
-last_memory = None
+    def sample():
+        while not done.wait(interval_sec):
+            peak[0] = max(peak[0], rss_mb())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        done.set()
+        sampler.join()
+    return result, max(peak[0], rss_mb()) - baseline
 
 # run grid test for all variable input combinations
-def run_experiment(exp_id, embed_model, chunk_size, overlap, vector_db, llm_model, question, 
+def run_experiment(exp_id, embed_model, chunk_size, overlap, vector_db, llm_model, question,
                    system_prompt="default", embed_index_time=None, embed_index_memory=None):
-    print(f"\n▶ Running: {embed_model} | chunk={chunk_size} | overlap={overlap} | db={vector_db} | llm={llm_model}")
+    print(f"\n▶ Running {exp_id}: {embed_model} | chunk={chunk_size} | overlap={overlap} | db={vector_db} | llm={llm_model}")
     row = {
         "exp_id": exp_id,
         "embed_model": embed_model,
@@ -54,58 +114,142 @@ def run_experiment(exp_id, embed_model, chunk_size, overlap, vector_db, llm_mode
         "llm_model": llm_model,
         "question": question,
         "system_prompt": system_prompt,
-        "embedding_and_index_time_sec": round(embed_index_time, 2) if embed_index_time else "",
-        "embedding_and_index_memory_mb": round(embed_index_memory, 2) if embed_index_memory else ""
+        "embedding_and_index_time_sec": round(embed_index_time, 2) if embed_index_time is not None else "",
+        "embedding_and_index_memory_mb": round(embed_index_memory, 2) if embed_index_memory is not None else ""
     }
 
-    # query timing and memory
+    # query timing and peak memory growth, in-process with the already loaded model and index; with more
+    # than one worker, runs share ollama and the process, so these columns include other runs' work
+    llm_metrics = {}
     start = time.time()
-    result = subprocess.run([
-        "python", os.path.join(PROJECT_ROOT, "src", "test_query.py"),
-        "--model", embed_model,
-        "--chunk_size", str(chunk_size),
-        "--overlap", str(overlap),
-        "--source", vector_db,
-        "--llm_model", llm_model,
-        "--question", question,
-        "--system_prompt", system_prompt
-    ], capture_output=True, text=True)
+    try:
+        response_text, query_memory = run_with_peak_rss(
+            query_llm,
+            question=question,
+            source=vector_db,
+            model=llm_model,
+            system_prompt=system_prompt,
+            embed_model=embed_model,
+            chunk_size=chunk_size,
+            overlap=overlap,
+            metrics=llm_metrics
+        )
+        response_text = response_text.strip() or "(No response)"
+    except Exception as e:
+        # not logged or checkpointed, so a resumed grid retries it
+        print(f"Experiment {exp_id} failed: {e}")
+        return None
     query_time = time.time() - start
     row["query_time_sec"] = round(query_time, 2)
+    row["query_memory_mb"] = round(query_memory, 2)
 
-    output = result.stdout.strip()
-
-    # parse <QUERY_MEMORY_MB>
-    mem_match = re.search(r"<QUERY_MEMORY_MB>(.*?)</QUERY_MEMORY_MB>", output)
-    if mem_match:
-        try:
-            row["query_memory_mb"] = round(float(mem_match.group(1)), 2)
-        except:
-            row["query_memory_mb"] = ""
-    else:
-        row["query_memory_mb"] = ""
+    # llm timing breakdown
+    for key in ("ttft_sec", "prompt_eval_sec", "tokens_per_sec"):
+        value = llm_metrics.get(key)
+        row[f"llm_{key}"] = round(value, 4) if value is not None else ""
+    for key in ("context_tokens", "context_tokens_saved"):
+        row[key] = llm_metrics.get(key, "")
 
     # total runtime
     row["total_runtime_sec"] = round(query_time + (embed_index_time or 0), 2)
-
-    # parse <LLM_RESPONSE>
-    match = re.search(r"<LLM_RESPONSE>(.*?)</LLM_RESPONSE>", output, re.DOTALL)
-    if match:
-        response_text = match.group(1).strip()
-    else:
-        response_text = "(No response)"
     row["llm_response_summary"] = response_text[:100].replace("\n", " ")
 
     # save full response to shared file
-    with open(LLM_OUTPUT_FILE, "a", encoding="utf-8") as f:
-        f.write(f"--- Experiment {exp_id} ---\n")
-        f.write(f"Model: {embed_model} | Chunk: {chunk_size} | Overlap: {overlap} | DB: {vector_db} | LLM: {llm_model}\n")
-        f.write(f"Prompt: {system_prompt}\n")
-        f.write(f"Question: {question}\n")
-        f.write("LLM Response:\n")
-        f.write(response_text + "\n\n")
+    save_llm_output(
+        f"--- Experiment {exp_id} ---\n"
+        f"Model: {embed_model} | Chunk: {chunk_size} | Overlap: {overlap} | DB: {vector_db} | LLM: {llm_model}\n"
+        f"Prompt: {system_prompt}\n"
+        f"Question: {question}\n"
+        "LLM Response:\n"
+        f"{response_text}\n\n"
+    )
 
     log_result(row)
+    return exp_id
+
+# embed once for a (model, chunk, overlap) group, then index each vector db it needs; a db's build memory is the
+# peak rss growth while embedding or while indexing it, since the harness process keeps earlier models loaded
+def build_group(embed_model, chunk_size, overlap, vector_dbs):
+    print(f"\nEmbedding + indexing: {embed_model} | chunk={chunk_size} | overlap={overlap} | dbs={vector_dbs}")
+    start = time.time()
+    _, embed_memory = run_with_peak_rss(run_embedding_pipeline, [embed_model], [chunk_size], [overlap])
+    embed_time = time.time() - start
+
+    embedding_stem = os.path.join(EMBEDDING_RESULTS_DIR, config_name(embed_model, chunk_size, overlap))
+    build_stats = {}
+    for vector_db in vector_dbs:
+        start = time.time()
+        _, index_memory = run_with_peak_rss(indexing.load_and_store_embeddings, embedding_stem, vector_db=vector_db)
+        build_stats[vector_db] = (embed_time + time.time() - start, max(embed_memory, index_memory))
+
+    record_indexed_config(embed_model, chunk_size, overlap, vector_dbs)
+    return build_stats
+
+# completed experiment ids survive interruptions; a changed grid starts a new checkpoint
+def load_checkpoint(grid_id):
+    if os.path.exists(CHECKPOINT_FILE):
+        with open(CHECKPOINT_FILE, "r") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("grid_id") == grid_id:
+            return checkpoint
+    return {"grid_id": grid_id, "log_file": None, "llm_output_file": None, "completed": []}
+
+def save_checkpoint(checkpoint):
+    if not os.path.exists(LOG_DIR):
+        os.makedirs(LOG_DIR)
+    tmp_path = f"{CHECKPOINT_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, CHECKPOINT_FILE)
+
+# run the grid grouped by embedding config, with up to `workers` retrieval/llm steps in flight
+def run_grid(experiments, workers=1, resume=True):
+    global LOG_FILE, LLM_OUTPUT_FILE
+
+    grid_id = hashlib.sha256(json.dumps(experiments).encode("utf-8")).hexdigest()[:16]
+    checkpoint = load_checkpoint(grid_id) if resume else {
+        "grid_id": grid_id, "log_file": None, "llm_output_file": None, "completed": []
+    }
+    completed = set(checkpoint["completed"])
+    # every run must reach the llm: the redis, faiss and chroma runs of one config usually retrieve the
+    # same chunks, and cache hits would turn their query and ttft timings into dict lookups
+    configure_caches(max_entries=0)
+    if completed:
+        print(f"Resuming grid: {len(completed)}/{len(experiments)} experiments already done")
+        LOG_FILE = checkpoint["log_file"] or LOG_FILE
+        LLM_OUTPUT_FILE = checkpoint["llm_output_file"] or LLM_OUTPUT_FILE
+
+    groups = OrderedDict()
+    for exp_id, experiment in enumerate(experiments, start=1):
+        if exp_id not in completed:
+            groups.setdefault(tuple(experiment[:3]), []).append((exp_id, experiment))
+
+    try:
+        for (embed_model, chunk_size, overlap), group in groups.items():
+            vector_dbs = list(OrderedDict.fromkeys(experiment[3] for _, experiment in group))
+            build_stats = build_group(embed_model, chunk_size, overlap, vector_dbs)
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = []
+                for exp_id, (_, _, _, vector_db, llm_model, question, system_prompt) in group:
+                    embed_index_time, embed_index_memory = build_stats[vector_db]
+                    futures.append(executor.submit(
+                        run_experiment, exp_id, embed_model, chunk_size, overlap, vector_db, llm_model,
+                        question, system_prompt,
+                        embed_index_time=embed_index_time,
+                        embed_index_memory=embed_index_memory
+                    ))
+
+                for future in as_completed(futures):
+                    exp_id = future.result()
+                    if exp_id is None:
+                        continue
+                    completed.add(exp_id)
+                    checkpoint.update(completed=sorted(completed), log_file=LOG_FILE, llm_output_file=LLM_OUTPUT_FILE)
+                    save_checkpoint(checkpoint)
+                    print(f"Experiment progress: {len(completed)}/{len(experiments)}")
+    finally:
+        close_logs()
 
 
 # EXPERIMENT GRID CONFIGURATION
@@ -123,62 +267,25 @@ system_prompts = [
 ]
 
 # MAIN LOOP
-last_embedding_config = {}
-experiments = list(product(embed_models, chunk_sizes, overlaps, vector_dbs, llm_models, questions, system_prompts))
-total_experiments = len(experiments)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1,
+                        help="concurrent retrieval/LLM experiments; latency and memory columns are only comparable at 1")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and rerun the whole grid")
+    parser.add_argument("--trace", help="record per-stage spans and export them to this .json/.csv file")
+    parser.add_argument("--profile_stage", help="cProfile spans matching this glob (e.g. 'embedding.*') into profiles/")
+    args = parser.parse_args()
 
-for i, (embed_model, chunk_size, overlap, vector_db, llm_model, question, system_prompt) in enumerate(experiments, start=1):
-    print(f"\nExperiment {i}/{total_experiments}")
+    if args.trace or args.profile_stage:
+        tracing.enable()
+    if args.profile_stage:
+        tracing.add_hook(args.profile_stage, tracing.profile_hook(os.path.join(PROJECT_ROOT, "profiles")))
 
-    # set current data configuration
-    current_config = {
-        "embed_model": embed_model,
-        "chunk_size": chunk_size,
-        "overlap": overlap,
-        "vector_db": vector_db
-    }
+    experiments = [list(experiment) for experiment in
+                   product(embed_models, chunk_sizes, overlaps, vector_dbs, llm_models, questions, system_prompts)]
+    print(f"Running {len(experiments)} experiments with {args.workers} workers")
+    run_grid(experiments, workers=args.workers, resume=not args.restart)
 
-    # regen data for configuration different from previous
-    if current_config != last_embedding_config:
-        print("Regenerating embeddings + indexing...")
-
-        start_time = time.time()
-        proc = subprocess.Popen([
-            "python", os.path.join(PROJECT_ROOT, "src", "load_dbs.py"),
-            "--model", embed_model,
-            "--chunk_size", str(chunk_size),
-            "--overlap", str(overlap),
-            "--vector_db", vector_db
-        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-        try:
-            p = psutil.Process(proc.pid)
-            peak_mem = 0
-            while proc.poll() is None:
-                mem = p.memory_info().rss / 1024 / 1024
-                peak_mem = max(peak_mem, mem)
-                time.sleep(0.1)
-        except Exception as e:
-            print(f"Could not capture accurate memory: {e}")
-            peak_mem = None
-
-        proc.communicate()
-        embed_index_time = time.time() - start_time
-        embed_index_memory = peak_mem
-
-        last_embedding_config = current_config.copy()
-        last_time = embed_index_time
-        last_memory = embed_index_memory
-    else:
-        # resuse previous data configuration if same
-        print("Reusing existing embeddings and DB index")
-        embed_index_time = last_time
-        embed_index_memory = last_memory
-
-    # run experiment
-    run_experiment(
-        i, embed_model, chunk_size, overlap, vector_db, llm_model,
-        question, system_prompt,
-        embed_index_time=embed_index_time,
-        embed_index_memory=embed_index_memory
-    )
+    if args.trace:
+        tracing.print_summary()
+        tracing.export(args.trace)
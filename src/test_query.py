@@ -1,13 +1,11 @@
 import argparse
-import json
-import os
 import time
 import sys
-import tracemalloc
-from query import query_llm
-
-PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-CONFIG_FILE = os.path.join(PROJECT_ROOT, "last_indexed_config.json")
+import psutil
+import tracing
+import embedding
+from query import query_llm, stream_llm
+from indexed_configs import latest_indexed_config
 
 if __name__ == "__main__":
     # try to read defaults from config file
@@ -16,18 +14,17 @@ if __name__ == "__main__":
     default_overlap = 50
     default_source = "redis"
 
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                config = json.load(f)
-                default_model = config.get("model", default_model)
-                default_chunk_size = config.get("chunk_size", default_chunk_size)
-                default_overlap = config.get("overlap", default_overlap)
-                vector_dbs = config.get("vector_dbs", [])
-                if default_source not in vector_dbs and vector_dbs:
-                    default_source = vector_dbs[0]
-        except Exception as e:
-            print(f"Failed to read config file: {e}")
+    try:
+        # the most recently indexed config supplies the defaults
+        config = latest_indexed_config() or {}
+        default_model = config.get("model", default_model)
+        default_chunk_size = config.get("chunk_size", default_chunk_size)
+        default_overlap = config.get("overlap", default_overlap)
+        vector_dbs = config.get("vector_dbs", [])
+        if default_source not in vector_dbs and vector_dbs:
+            default_source = vector_dbs[0]
+    except Exception as e:
+        print(f"Failed to read config file: {e}")
 
     # define CLI arguments
     parser = argparse.ArgumentParser()
@@ -38,7 +35,18 @@ if __name__ == "__main__":
     parser.add_argument("--model")
     parser.add_argument("--chunk_size", type=int)
     parser.add_argument("--overlap", type=int)
+    parser.add_argument("--modules", nargs="+", help="only retrieve chunks from these modules")
+    parser.add_argument("--sources", nargs="+", help="only retrieve chunks from these pdf files")
+    parser.add_argument("--context_tokens", type=int, help="token budget for retrieved context (default: per LLM)")
+    parser.add_argument("--stream", action="store_true", help="print tokens as they arrive")
+    parser.add_argument("--embed_backend", choices=embedding.EMBED_BACKENDS, default=embedding.default_backend,
+                        help="embed the question with torch, onnx or onnx_int8")
+    parser.add_argument("--trace", help="record per-stage spans and export them to this .json/.csv file")
     args = parser.parse_args()
+    embedding.set_backend(args.embed_backend)
+
+    if args.trace:
+        tracing.enable()
 
     print("\n--- Manual RAG Query ---")
     print(f"Question: {args.question}")
@@ -47,31 +55,52 @@ if __name__ == "__main__":
     print(f"System prompt: {args.system_prompt}\n")
 
     print("Asking LLM...")
-    tracemalloc.start()
     start_time = time.time()
 
     # query llm
-    response = query_llm(
+    llm_metrics = {}
+    query_args = dict(
         question=args.question,
         source=args.source,
         model=args.llm_model,
         system_prompt=args.system_prompt,
         embed_model=args.model or default_model,
-        chunk_size=args.chunk_size or default_chunk_size,
-        overlap=args.overlap or default_overlap
+        chunk_size=args.chunk_size if args.chunk_size is not None else default_chunk_size,
+        overlap=args.overlap if args.overlap is not None else default_overlap,
+        metrics=llm_metrics,
+        filters={"module": args.modules, "source": args.sources},
+        token_budget=args.context_tokens
     )
+    if args.stream:
+        tokens = []
+        for token in stream_llm(**query_args):
+            print(token, end="", flush=True)
+            tokens.append(token)
+        print()
+        response = "".join(tokens)
+    else:
+        response = query_llm(**query_args)
 
     end_time = time.time()
-    current, peak = tracemalloc.get_traced_memory()
-    tracemalloc.stop()
+    rss_mb = psutil.Process().memory_info().rss / 1024 / 1024
 
     #display response
     print("\nGot response!")
     print("<LLM_RESPONSE>")
     print(response)
     print("</LLM_RESPONSE>")
-    print(f"<QUERY_MEMORY_MB>{peak / 1024 / 1024:.2f}</QUERY_MEMORY_MB>")
+    print(f"<QUERY_MEMORY_MB>{rss_mb:.2f}</QUERY_MEMORY_MB>")
+    for key in ("ttft_sec", "prompt_eval_sec", "tokens_per_sec"):
+        if llm_metrics.get(key) is not None:
+            print(f"<LLM_{key.upper()}>{llm_metrics[key]:.4f}</LLM_{key.upper()}>")
+    if llm_metrics.get("context_tokens") is not None:
+        print(f"<CONTEXT_TOKENS>{llm_metrics['context_tokens']}</CONTEXT_TOKENS>")
+        print(f"<CONTEXT_TOKENS_SAVED>{llm_metrics['context_tokens_saved']}</CONTEXT_TOKENS_SAVED>")
     print(f"\nQuery completed in {end_time - start_time:.2f} seconds.")
+
+    if args.trace:
+        tracing.print_summary()
+        tracing.export(args.trace)
     
     # flush output
     sys.stdout.flush()
@@ -0,0 +1,205 @@
+import os
+import csv
+import json
+import time
+import fnmatch
+import threading
+import cProfile
+
+# tracing is off unless RAG_TRACE=1 or enable() is called; disabled spans are a shared no-op
+enabled = os.environ.get("RAG_TRACE", "0") == "1"
+
+spans = []
+hooks = []
+_lock = threading.Lock()
+_local = threading.local()
+
+try:
+    import psutil
+    _process = psutil.Process()
+except ImportError:
+    _process = None
+
+def _rss_mb():
+    return _process.memory_info().rss / 1024 / 1024 if _process is not None else None
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def tag(self, **tags):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+# one timed stage: wall time, rss before/after, parent span and config tags
+class Span:
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+        self.active_hooks = []
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+
+        for pattern, hook in hooks:
+            if fnmatch.fnmatchcase(self.name, pattern):
+                context = hook(self.name, self.tags)
+                context.__enter__()
+                self.active_hooks.append(context)
+
+        self.rss_start = _rss_mb()
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        rss_end = _rss_mb()
+        for context in reversed(self.active_hooks):
+            context.__exit__(exc_type, exc, tb)
+        _local.stack.pop()
+
+        record(self.name, duration, started_at=self.started_at, parent=self.parent,
+               rss_start_mb=self.rss_start, rss_end_mb=rss_end, error=exc_type.__name__ if exc_type else None,
+               **self.tags)
+        return False
+
+    def tag(self, **tags):
+        self.tags.update(tags)
+
+# time a stage: `with span("embedding.encode", model=name): ...`
+def span(name, **tags):
+    if not enabled:
+        return NOOP_SPAN
+    return Span(name, tags)
+
+# add a span measured elsewhere (e.g. llm prefill time reported by the server)
+def record(name, duration_sec, started_at=None, parent=None, rss_start_mb=None, rss_end_mb=None, error=None, **tags):
+    if not enabled:
+        return
+    entry = {
+        "name": name,
+        "parent": parent,
+        "started_at": started_at if started_at is not None else time.time() - duration_sec,
+        "duration_sec": duration_sec,
+        "rss_start_mb": rss_start_mb,
+        "rss_end_mb": rss_end_mb,
+        "rss_delta_mb": rss_end_mb - rss_start_mb if rss_start_mb is not None and rss_end_mb is not None else None,
+        "error": error,
+        "pid": os.getpid(),
+        "thread": threading.current_thread().name,
+        "tags": tags
+    }
+    with _lock:
+        spans.append(entry)
+
+def enable(flag=True):
+    global enabled
+    enabled = flag
+
+# take and clear the recorded spans (used to ship spans back from worker processes)
+def drain():
+    with _lock:
+        drained = list(spans)
+        spans.clear()
+    return drained
+
+def extend(entries):
+    if enabled and entries:
+        with _lock:
+            spans.extend(entries)
+
+# attach a hook to every stage matching a glob pattern; hook(name, tags) returns a context manager
+def add_hook(pattern, hook):
+    hooks.append((pattern, hook))
+
+def clear_hooks():
+    hooks.clear()
+
+# cProfile each matching span and dump one .prof file per span
+def profile_hook(output_dir):
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    counter = {"n": 0}
+
+    class _Profile:
+        def __init__(self, name):
+            self.name = name
+            self.profile = cProfile.Profile()
+
+        def __enter__(self):
+            self.profile.enable()
+
+        def __exit__(self, *exc):
+            self.profile.disable()
+            with _lock:
+                counter["n"] += 1
+                n = counter["n"]
+            self.profile.dump_stats(os.path.join(output_dir, f"{self.name}_{os.getpid()}_{n}.prof"))
+
+    return lambda name, tags: _Profile(name)
+
+# rename the running thread to the stage so py-spy dump/top output shows which stage is executing
+def thread_name_hook(name, tags):
+    class _ThreadName:
+        def __enter__(self):
+            self.thread = threading.current_thread()
+            self.previous = self.thread.name
+            self.thread.name = f"{self.previous}:{name}"
+
+        def __exit__(self, *exc):
+            self.thread.name = self.previous
+
+    return _ThreadName()
+
+# per-stage count / total / mean duration
+def summary():
+    totals = {}
+    with _lock:
+        for entry in spans:
+            stats = totals.setdefault(entry["name"], {"count": 0, "total_sec": 0.0})
+            stats["count"] += 1
+            stats["total_sec"] += entry["duration_sec"]
+    for stats in totals.values():
+        stats["mean_sec"] = stats["total_sec"] / stats["count"]
+    return totals
+
+def print_summary():
+    for name, stats in sorted(summary().items(), key=lambda item: -item[1]["total_sec"]):
+        print(f"{name:<28} count={stats['count']:<6} total={stats['total_sec']:.3f}s mean={stats['mean_sec']:.4f}s")
+
+def export_json(path):
+    with _lock:
+        entries = list(spans)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2)
+
+# flat csv: one column per tag seen on any span
+def export_csv(path):
+    with _lock:
+        entries = list(spans)
+    tag_names = sorted({name for entry in entries for name in entry["tags"]})
+    fields = [field for field in (entries[0] if entries else {}) if field != "tags"] + tag_names
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for entry in entries:
+            row = {key: value for key, value in entry.items() if key != "tags"}
+            row.update(entry["tags"])
+            writer.writerow(row)
+
+# export by extension: .csv or anything else as json
+def export(path):
+    if path.endswith(".csv"):
+        export_csv(path)
+    else:
+        export_json(path)
+    print(f"Saved {len(spans)} trace spans to {path}")
@@ -0,0 +1,698 @@
+import os
+import re
+import json
+import time
+import threading
+import numpy as np
+import backends
+from embedding_store import as_float32, ChunkTable
+from query_cache import index_version
+
+VECTOR_DIM = 768
+DOC_PREFIX = "doc:"
+INDEX_NAME = "embedding_index"
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+FAISS_INDEX_DIR = os.path.join(PROJECT_ROOT, "faiss_indexes")
+
+# flat/hnsw/ivf_*/sq* score cosine as inner product on normalized vectors; flat_l2 keeps raw L2 distance
+FAISS_INDEX_TYPES = ["flat", "flat_l2", "hnsw", "ivf_flat", "ivf_pq", "sq8", "sq_fp16"]
+
+# reduced-precision stores: faiss swaps its exact flat index for a scalar-quantized one, and redis
+# stores FLOAT16 vectors (redis-stack has no int8 vector type, so int8 stores index as FLOAT16)
+FAISS_PRECISION_TYPES = {"float16": "sq_fp16", "int8": "sq8"}
+REDIS_VECTOR_TYPES = {"float32": "FLOAT32", "float16": "FLOAT16", "int8": "FLOAT16"}
+REDIS_NUMPY_TYPES = {"FLOAT32": np.float32, "FLOAT16": np.float16}
+DEFAULT_FAISS_PARAMS = {"nlist": 100, "pq_m": 16, "pq_nbits": 8, "hnsw_m": 32, "ef_construction": 200}
+
+# chunk metadata a search can be scoped to: module name(s) and/or source pdf file(s)
+FILTER_FIELDS = ("module", "source")
+
+# stable id of a chunk, shared by every vector store
+def chunk_id(entry):
+    return entry.get("id") or f"{entry['source']}:{entry['slide_number']}"
+
+# character span of a chunk in its source document, for merging overlapping hits; omitted when unknown
+def chunk_position(entry):
+    return {field: int(entry[field]) for field in ("start_char", "end_char") if entry.get(field) is not None}
+
+# int field read back from a store that keeps strings, or None
+def int_field(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+# canonical form of a search filter: {field: sorted tuple of allowed values}, or None for no filter
+def normalize_filters(filters):
+    if not filters:
+        return None
+    unknown = set(filters) - set(FILTER_FIELDS)
+    if unknown:
+        raise ValueError(f"Unsupported filter field(s): {', '.join(sorted(unknown))}")
+
+    normalized = {}
+    for field in FILTER_FIELDS:
+        values = filters.get(field)
+        if values is None or values == []:
+            continue
+        values = [values] if isinstance(values, str) else values
+        normalized[field] = tuple(sorted(set(str(value) for value in values)))
+    return normalized or None
+
+# hashable version of a filter for cache keys
+def filter_key(filters):
+    filters = normalize_filters(filters)
+    return tuple(sorted(filters.items())) if filters else None
+
+# common interface of the redis, chroma and faiss stores; `data` rows are chunk metadata aligned with `embeddings`
+class VectorStore:
+    name = None
+
+    # drop whatever the store holds and start an empty one for `dimension`-dim vectors stored at `precision`
+    def create(self, dimension, train_vectors=None, precision="float32"):
+        raise NotImplementedError
+
+    def exists(self):
+        raise NotImplementedError
+
+    # first load into a freshly created store; stores that can skip id checks override this
+    def bulk_add(self, embeddings, data, batch_size=500):
+        self.upsert(embeddings, data, batch_size)
+
+    def upsert(self, embeddings, data, batch_size=500):
+        raise NotImplementedError
+
+    def delete(self, ids, batch_size=500):
+        raise NotImplementedError
+
+    def search(self, query_vec, top_k=3, filters=None, **params):
+        return self.search_batch([query_vec], top_k, filters=filters, **params)[0]
+
+    # top_k chunk metadata per query vector, in query order, restricted to chunks matching `filters`
+    def search_batch(self, query_vecs, top_k=3, filters=None, **params):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+    # persist to disk where the store is not already durable
+    def save(self):
+        pass
+
+# escape punctuation and spaces inside a TAG query value
+def redis_tag_escape(value):
+    return re.sub(r"([^A-Za-z0-9_])", r"\\\1", value)
+
+# hybrid pre-filter, e.g. (@module:{01\ Intro|02\ ACID}); "*" searches the whole index
+def redis_filter_query(filters):
+    filters = normalize_filters(filters)
+    if not filters:
+        return "*"
+    clauses = [f"@{field}:{{{'|'.join(redis_tag_escape(value) for value in values)}}}"
+               for field, values in filters.items()]
+    return f"({' '.join(clauses)})"
+
+# knn query for one vector, as raw FT.SEARCH arguments so it can be pipelined
+def redis_knn_command(index_name, query_vec, top_k, filters=None, vector_type="FLOAT32"):
+    return [
+        "FT.SEARCH", index_name, f"{redis_filter_query(filters)}=>[KNN {top_k} @embedding $vec AS score]",
+        "PARAMS", 2, "vec", np.asarray(query_vec, dtype=REDIS_NUMPY_TYPES[vector_type]).tobytes(),
+        "SORTBY", "score",
+        "RETURN", 7, "text", "module", "slide_number", "source", "start_char", "end_char", "score",
+        "LIMIT", 0, top_k,
+        "DIALECT", 2
+    ]
+
+# FT.SEARCH reply: [total, key, [field, value, ...], key, [...], ...]
+def parse_redis_results(reply):
+    results = []
+    for fields in reply[2::2]:
+        doc = dict(zip(fields[::2], fields[1::2]))
+        results.append({
+            "text": doc.get("text"),
+            "module": doc.get("module"),
+            "slide_number": doc.get("slide_number"),
+            "source": doc.get("source") or None,
+            "start_char": int_field(doc.get("start_char")),
+            "end_char": int_field(doc.get("end_char"))
+        })
+    return results
+
+# FT.INFO reply as a dict of the fields we report
+def parse_redis_info(reply):
+    info = dict(zip(reply[::2], reply[1::2]))
+    return {
+        "documents": int(info.get("num_docs", 0)),
+        "index_mb": float(info.get("vector_index_sz_mb", 0) or 0),
+        "indexing": int(info.get("indexing", 0) or 0)
+    }
+
+# one redis index and key prefix per config: embedding_index:<config> over the hashes doc:<config>:*
+def redis_names(config_name):
+    return f"{INDEX_NAME}:{config_name}", f"{DOC_PREFIX}{config_name}:"
+
+# hash (outside the document prefix) recording how an index stores its vectors
+def redis_settings_key(index_name):
+    return f"{index_name}:settings"
+
+# redis-stack hnsw index over hashes under `prefix`; commands go through the shared connection pool
+class RedisStore(VectorStore):
+    name = "redis"
+
+    def __init__(self, index_name=INDEX_NAME, prefix=DOC_PREFIX, client=None, config_name=None):
+        self.index_name = index_name
+        self.prefix = prefix
+        self.client = client or backends.get("redis")
+        self.config_name = config_name
+        self._vector_type = None
+        self._vector_type_version = None
+
+    @classmethod
+    def for_config(cls, config_name):
+        return cls(*redis_names(config_name), config_name=config_name)
+
+    # FLOAT32 or FLOAT16, as recorded when the index was created; read again after another process
+    # rebuilds the config's index, possibly at a different precision
+    @property
+    def vector_type(self):
+        version = index_version(self.config_name, "redis") if self.config_name else None
+        if self._vector_type is None or version != self._vector_type_version:
+            self._vector_type = self.client.hget(redis_settings_key(self.index_name), "vector_type") or "FLOAT32"
+            self._vector_type_version = version
+        return self._vector_type
+
+    def create(self, dimension, train_vectors=None, precision="float32"):
+        from redis.exceptions import ResponseError
+        try:
+            # DD also deletes the hashes, leaving other indexes' documents alone
+            self.client.execute_command(f"FT.DROPINDEX {self.index_name} DD")
+        except ResponseError:
+            pass
+
+        self.client.execute_command(
+            f"""
+            FT.CREATE {self.index_name} ON HASH PREFIX 1 {self.prefix}
+            SCHEMA text TEXT module TAG SEPARATOR | source TAG SEPARATOR | slide_number TEXT
+            embedding VECTOR HNSW 6
+            DIM {dimension}
+            TYPE {REDIS_VECTOR_TYPES[precision]}
+            DISTANCE_METRIC COSINE
+            """
+        )
+        self._vector_type = REDIS_VECTOR_TYPES[precision]
+        self.client.hset(redis_settings_key(self.index_name), mapping={"vector_type": self._vector_type})
+
+    def exists(self):
+        from redis.exceptions import ResponseError
+        try:
+            self.client.execute_command(f"FT.INFO {self.index_name}")
+            return True
+        except ResponseError:
+            return False
+
+    # pipelined transactions, one round trip per batch
+    def upsert(self, embeddings, data, batch_size=500):
+        vector_dtype = REDIS_NUMPY_TYPES[self.vector_type]
+        for start in range(0, len(data), batch_size):
+            batch = np.asarray(embeddings[start:start + batch_size], dtype=vector_dtype)
+            pipe = self.client.pipeline(transaction=True)
+            for offset, embedding in enumerate(batch):
+                entry = data[start + offset]
+                pipe.hset(
+                    f"{self.prefix}{chunk_id(entry)}",
+                    mapping={
+                        "text": entry["text"],
+                        "module": entry["module"],
+                        "source": entry.get("source") or "",
+                        "slide_number": entry["slide_number"],
+                        **chunk_position(entry),
+                        "embedding": embedding.tobytes()
+                    }
+                )
+            pipe.execute()
+
+    def delete(self, ids, batch_size=500):
+        for start in range(0, len(ids), batch_size):
+            self.client.delete(*[f"{self.prefix}{i}" for i in ids[start:start + batch_size]])
+
+    # pipelined knn queries, one round trip for the whole batch
+    def search_batch(self, query_vecs, top_k=3, filters=None, **params):
+        pipe = self.client.pipeline(transaction=False)
+        for query_vec in query_vecs:
+            pipe.execute_command(*redis_knn_command(self.index_name, query_vec, top_k, filters, self.vector_type))
+        return [parse_redis_results(reply) for reply in pipe.execute()]
+
+    def stats(self):
+        stats = parse_redis_info(self.client.execute_command("FT.INFO", self.index_name))
+        stats["backend"] = self.name
+        stats["index"] = self.index_name
+        stats["vector_type"] = self.vector_type
+        return stats
+
+# asyncio twin of RedisStore's read path for the event-loop server
+class AsyncRedisStore:
+    name = "redis_async"
+
+    def __init__(self, index_name=INDEX_NAME, prefix=DOC_PREFIX, client=None, config_name=None):
+        self.index_name = index_name
+        self.prefix = prefix
+        self.client = client or backends.get("redis_async")
+        self.config_name = config_name
+        self._vector_type = None
+        self._vector_type_version = None
+
+    @classmethod
+    def for_config(cls, config_name):
+        return cls(*redis_names(config_name), config_name=config_name)
+
+    async def vector_type(self):
+        version = index_version(self.config_name, "redis") if self.config_name else None
+        if self._vector_type is None or version != self._vector_type_version:
+            self._vector_type = await self.client.hget(redis_settings_key(self.index_name), "vector_type") or "FLOAT32"
+            self._vector_type_version = version
+        return self._vector_type
+
+    async def search(self, query_vec, top_k=3, filters=None, **params):
+        return (await self.search_batch([query_vec], top_k, filters=filters, **params))[0]
+
+    async def search_batch(self, query_vecs, top_k=3, filters=None, **params):
+        vector_type = await self.vector_type()
+        pipe = self.client.pipeline(transaction=False)
+        for query_vec in query_vecs:
+            pipe.execute_command(*redis_knn_command(self.index_name, query_vec, top_k, filters, vector_type))
+        return [parse_redis_results(reply) for reply in await pipe.execute()]
+
+    async def stats(self):
+        stats = parse_redis_info(await self.client.execute_command("FT.INFO", self.index_name))
+        stats["backend"] = self.name
+        stats["index"] = self.index_name
+        return stats
+
+# one chroma collection per config on the long-lived persistent client; the collection handle is opened once
+# and never gets an embedding function, so queries always pass vectors from the shared embedding model
+class ChromaStore(VectorStore):
+    name = "chroma"
+
+    def __init__(self, collection_name, client=None):
+        self.collection_name = collection_name
+        self.client = client or backends.get("chroma")
+        self._collection = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            self._collection = self.client.get_or_create_collection(
+                name=self.collection_name,
+                metadata={"hnsw:space": "cosine"},
+                embedding_function=None
+            )
+        return self._collection
+
+    # chroma's hnsw keeps float32 vectors whatever the stored precision
+    def create(self, dimension, train_vectors=None, precision="float32"):
+        try:
+            self.client.delete_collection(self.collection_name)
+        except Exception:
+            pass
+
+        try:
+            self._collection = self.client.create_collection(
+                name=self.collection_name,
+                metadata={"hnsw:space": "cosine"},
+                embedding_function=None,
+                dimension=dimension
+            )
+        except TypeError:
+            # fallback for chrom versions that do not support dimension argument
+            print(f"Chroma doesn't support `dimension=` in this version. Falling back without it.")
+            self._collection = self.client.create_collection(
+                name=self.collection_name,
+                metadata={"hnsw:space": "cosine"},
+                embedding_function=None
+            )
+
+    def exists(self):
+        return self.collection_name in [
+            getattr(collection, "name", collection) for collection in self.client.list_collections()
+        ]
+
+    # one upsert call per batch
+    def upsert(self, embeddings, data, batch_size=500):
+        for start in range(0, len(data), batch_size):
+            batch = data[start:start + batch_size]
+            self.collection.upsert(
+                documents=[entry["text"] for entry in batch],
+                embeddings=list(as_float32(embeddings[start:start + batch_size])),
+                metadatas=[{
+                    "module": entry["module"],
+                    "source": entry.get("source") or "",
+                    "slide_number": entry["slide_number"],
+                    **chunk_position(entry)
+                } for entry in batch],
+                ids=[chunk_id(entry) for entry in batch]
+            )
+
+    def delete(self, ids, batch_size=500):
+        for start in range(0, len(ids), batch_size):
+            self.collection.delete(ids=ids[start:start + batch_size])
+
+    # chroma `where` clause for a filter, or None to search the whole collection
+    @staticmethod
+    def where_clause(filters):
+        filters = normalize_filters(filters)
+        if not filters:
+            return None
+        clauses = [{field: {"$in": list(values)}} for field, values in filters.items()]
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    @staticmethod
+    def parse_results(query_results):
+        batch_results = []
+        for docs, metas in zip(query_results["documents"], query_results["metadatas"]):
+            batch_results.append([{
+                "text": doc,
+                "module": meta.get("module", "N/A"),
+                "slide_number": meta.get("slide_number", "N/A"),
+                "source": meta.get("source") or None,
+                "start_char": meta.get("start_char"),
+                "end_char": meta.get("end_char")
+            } for doc, meta in zip(docs, metas)])
+        return batch_results
+
+    # one multi-query call for every vector
+    def search_batch(self, query_vecs, top_k=3, filters=None, **params):
+        query_results = self.collection.query(
+            query_embeddings=as_float32(query_vecs).tolist(),
+            n_results=top_k,
+            where=self.where_clause(filters),
+            include=["documents", "metadatas"]
+        )
+        return self.parse_results(query_results)
+
+    def stats(self):
+        return {"backend": self.name, "collection": self.collection_name, "documents": self.collection.count()}
+
+def faiss_normalizes(index_type):
+    return index_type != "flat_l2"
+
+def faiss_needs_training(index_type):
+    return index_type.startswith("ivf") or index_type == "sq8"
+
+# index type to build for a requested type and stored precision
+def faiss_index_for_precision(index_type, precision):
+    if index_type == "flat":
+        return FAISS_PRECISION_TYPES.get(precision, index_type)
+    return index_type
+
+# float32 copy of the vectors, unit-normalized when the index scores cosine
+def prepare_faiss_vectors(vectors, index_type):
+    vectors = np.array(vectors, dtype=np.float32, copy=True, order="C")
+    if faiss_normalizes(index_type) and len(vectors):
+        backends.get("faiss").normalize_L2(vectors)
+    return vectors
+
+# create (and train, for ivf and sq8 types) a faiss index of the requested type
+def build_faiss_index(dimension, index_type="flat", train_vectors=None, nlist=100, pq_m=16, pq_nbits=8,
+                      hnsw_m=32, ef_construction=200):
+    faiss = backends.get("faiss")
+    if index_type == "flat_l2":
+        return faiss.IndexFlatL2(dimension)
+    if index_type == "flat":
+        return faiss.IndexFlatIP(dimension)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = ef_construction
+        return index
+    if index_type == "sq_fp16":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    if index_type == "sq8":
+        if train_vectors is None or len(train_vectors) == 0:
+            raise ValueError("FAISS sq8 needs training vectors")
+        # per-dimension value ranges learned from the training vectors
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        index.train(train_vectors)
+        return index
+    if index_type not in ("ivf_flat", "ivf_pq"):
+        raise ValueError(f"Unsupported FAISS index type: {index_type}")
+
+    if train_vectors is None or len(train_vectors) == 0:
+        raise ValueError(f"FAISS {index_type} needs training vectors")
+    n_train = len(train_vectors)
+
+    # keep roughly 39 training points per list, as faiss recommends
+    lists = max(1, min(nlist, n_train // 39))
+    if lists != nlist:
+        print(f"Reducing nlist from {nlist} to {lists} for {n_train} training vectors")
+    quantizer = faiss.IndexFlatIP(dimension)
+
+    if index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dimension, lists, faiss.METRIC_INNER_PRODUCT)
+    else:
+        # pq needs m to divide the dimension and, like the lists, ~39 training points per each of its 2^nbits centroids
+        m = max(sub for sub in range(1, min(pq_m, dimension) + 1) if dimension % sub == 0)
+        nbits = max(1, min(pq_nbits, int(np.log2(max(n_train // 39, 2)))))
+        if nbits != pq_nbits:
+            print(f"Reducing pq_nbits from {pq_nbits} to {nbits} for {n_train} training vectors")
+        index = faiss.IndexIVFPQ(quantizer, dimension, lists, m, nbits, faiss.METRIC_INNER_PRODUCT)
+
+    start = time.perf_counter()
+    index.train(train_vectors)
+    print(f"Trained FAISS {index_type} on {n_train} vectors in {time.perf_counter() - start:.2f}s")
+    return index
+
+# query-time knobs for approximate faiss indexes, plus an optional id selector restricting the rows searched
+def faiss_search_params(index_type, nprobe=None, ef_search=None, selector=None):
+    faiss = backends.get("faiss")
+    params = {"sel": selector} if selector is not None else {}
+    if index_type.startswith("ivf") and nprobe is not None:
+        return faiss.SearchParametersIVF(nprobe=nprobe, **params)
+    if index_type == "hnsw" and ef_search is not None:
+        return faiss.SearchParametersHNSW(efSearch=ef_search, **params)
+    if not params:
+        return None
+    if index_type.startswith("ivf"):
+        return faiss.SearchParametersIVF(**params)
+    if index_type == "hnsw":
+        return faiss.SearchParametersHNSW(**params)
+    return faiss.SearchParameters(**params)
+
+# selector over sorted row ids: a contiguous run becomes a range, which flat search scans on its own
+def faiss_row_selector(rows):
+    faiss = backends.get("faiss")
+    if rows[-1] - rows[0] + 1 == len(rows):
+        return faiss.IDSelectorRange(int(rows[0]), int(rows[-1]) + 1)
+    return faiss.IDSelectorBatch(rows)
+
+# chunk metadata kept next to a faiss index
+FAISS_SIDECAR_COLUMNS = ["text", "module", "slide_number", "source", "start_char", "end_char"]
+
+# paths of the serialized faiss index and its metadata sidecar for a config
+def faiss_index_paths(config_name):
+    return (
+        os.path.join(FAISS_INDEX_DIR, f"{config_name}.index"),
+        os.path.join(FAISS_INDEX_DIR, f"{config_name}.meta.json")
+    )
+
+# one faiss index per config, persisted as an index file plus a metadata sidecar
+class FaissStore(VectorStore):
+    name = "faiss"
+
+    def __init__(self, config_name, index_type="flat", params=None):
+        self.config_name = config_name
+        self.index_type = index_type
+        self.params = {**DEFAULT_FAISS_PARAMS, **(params or {})}
+        self.index = None
+        self.metadata = []
+        self.partitions = {}
+        self.mtime = None
+        self.lock = threading.Lock()
+
+    @property
+    def normalized(self):
+        return faiss_normalizes(self.index_type)
+
+    # only flat and scalar-quantized indexes can drop rows (they renumber the rest, keeping the sidecar aligned)
+    @property
+    def supports_removal(self):
+        return self.index_type in ("flat", "flat_l2", "sq8", "sq_fp16")
+
+    # precision is part of the faiss index type (see faiss_index_for_precision)
+    def create(self, dimension, train_vectors=None, precision="float32"):
+        print(f"Resetting FAISS index to dimension: {dimension} ({self.index_type})")
+        if train_vectors is not None and faiss_needs_training(self.index_type):
+            train_vectors = prepare_faiss_vectors(train_vectors, self.index_type)
+        self.index = build_faiss_index(dimension, self.index_type, train_vectors, **self.params)
+        self.metadata = []
+        self.partitions = {}
+
+    def exists(self):
+        return all(os.path.exists(path) for path in faiss_index_paths(self.config_name))
+
+    # one matrix add for the whole corpus
+    def bulk_add(self, embeddings, data, batch_size=500):
+        self.index.add(prepare_faiss_vectors(embeddings, self.index_type))
+        self.metadata = list(self.metadata) + list(data)
+        self.partitions = {}
+
+    def upsert(self, embeddings, data, batch_size=500):
+        new_ids = {chunk_id(entry) for entry in data}
+        if any(chunk_id(entry) in new_ids for entry in self.metadata):
+            self.delete(list(new_ids))
+        self.bulk_add(embeddings, data, batch_size)
+
+    def delete(self, ids, batch_size=500):
+        ids = set(ids)
+        stale_rows = [i for i, entry in enumerate(self.metadata) if chunk_id(entry) in ids]
+        if not stale_rows:
+            return
+        if not self.supports_removal:
+            raise ValueError(f"FAISS {self.index_type} indexes cannot remove vectors; rebuild the index instead")
+        self.index.remove_ids(np.array(stale_rows, dtype=np.int64))
+        self.metadata = [entry for entry in self.metadata if chunk_id(entry) not in ids]
+        self.partitions = {}
+
+    # row ids per value of a filter field, built once per index version
+    def partition(self, field):
+        if field not in self.partitions and isinstance(self.metadata, ChunkTable):
+            self.partitions[field] = self.metadata.groups(field)
+        if field not in self.partitions:
+            rows = {}
+            for i, entry in enumerate(self.metadata):
+                rows.setdefault(entry.get(field), []).append(i)
+            self.partitions[field] = {value: np.array(ids, dtype=np.int64) for value, ids in rows.items()}
+        return self.partitions[field]
+
+    # sorted rows matching every filter field, or None when unfiltered
+    def filter_rows(self, filters):
+        filters = normalize_filters(filters)
+        if not filters:
+            return None
+        rows = None
+        for field, values in filters.items():
+            partition = self.partition(field)
+            matched = np.unique(np.concatenate(
+                [partition[value] for value in values if value in partition] or [np.zeros(0, dtype=np.int64)]
+            ))
+            rows = matched if rows is None else np.intersect1d(rows, matched)
+        return rows
+
+    # one matrix search for every query vector; filters become an id selector so only matching rows are scored
+    def search_batch(self, query_vecs, top_k=3, filters=None, nprobe=None, ef_search=None, **params):
+        rows = self.filter_rows(filters)
+        if rows is not None and len(rows) == 0:
+            return [[] for _ in query_vecs]
+        selector = faiss_row_selector(rows) if rows is not None else None
+
+        query_vecs = np.array(query_vecs, dtype=np.float32, copy=True, order="C")
+        if self.normalized:
+            backends.get("faiss").normalize_L2(query_vecs)
+
+        search_params = faiss_search_params(self.index_type, nprobe=nprobe, ef_search=ef_search, selector=selector)
+        if search_params is not None:
+            D, I = self.index.search(query_vecs, top_k, params=search_params)
+        else:
+            D, I = self.index.search(query_vecs, top_k)
+        return [[self.metadata[i] for i in row if i >= 0] for row in I]
+
+    # write the index and compact columnar metadata (no embeddings) to disk
+    def save(self):
+        if not os.path.exists(FAISS_INDEX_DIR):
+            os.makedirs(FAISS_INDEX_DIR)
+
+        index_path, meta_path = faiss_index_paths(self.config_name)
+        backends.get("faiss").write_index(self.index, index_path)
+
+        entries = list(self.metadata)
+        columns = {column: [entry.get(column) for entry in entries] for column in FAISS_SIDECAR_COLUMNS}
+        sidecar = {
+            "index_type": self.index_type,
+            "normalized": self.normalized,
+            "columns": columns
+        }
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(sidecar, f, separators=(",", ":"))
+
+        self.mtime = os.path.getmtime(index_path)
+        print(f"Saved FAISS index ({self.index.ntotal} vectors) to {index_path}")
+
+    # read the persisted index; mmap opens it read-only and shares pages across processes
+    def load(self, mmap=True):
+        faiss = backends.get("faiss")
+        index_path, meta_path = faiss_index_paths(self.config_name)
+        mtime = os.path.getmtime(index_path)
+        if mmap:
+            try:
+                io_flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_READ_ONLY", 0)
+                index = faiss.read_index(index_path, io_flags)
+            except RuntimeError:
+                # index type without mmap support
+                index = faiss.read_index(index_path)
+        else:
+            index = faiss.read_index(index_path)
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        self.index = index
+        # sidecars written before the columnar layout hold one dict per row
+        self.metadata = ChunkTable(sidecar["columns"]) if "columns" in sidecar else sidecar["metadata"]
+        self.partitions = {}
+        self.index_type = sidecar["index_type"]
+        self.mtime = mtime
+
+    # load on first use, and again whenever the index file was rebuilt since it was opened
+    def ensure_loaded(self):
+        with self.lock:
+            index_path, _ = faiss_index_paths(self.config_name)
+            if self.index is None or os.path.getmtime(index_path) != self.mtime:
+                self.load()
+        return self
+
+    def stats(self):
+        index_path, _ = faiss_index_paths(self.config_name)
+        return {
+            "backend": self.name,
+            "config": self.config_name,
+            "index_type": self.index_type,
+            "vectors": self.index.ntotal if self.index is not None else 0,
+            "metadata_layout": "columnar" if isinstance(self.metadata, ChunkTable) else "rows",
+            "index_mb": os.path.getsize(index_path) / 1024 / 1024 if os.path.exists(index_path) else 0.0
+        }
+
+# store for a namespace; every backend keeps one index per config
+STORE_TYPES = {
+    "redis": RedisStore.for_config,
+    "redis_async": AsyncRedisStore.for_config,
+    "chroma": ChromaStore,
+    "faiss": FaissStore
+}
+
+# long-lived store per (vector db, namespace), where the namespace is a config name (or a chroma collection)
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store(vector_db, namespace):
+    if vector_db not in STORE_TYPES:
+        raise ValueError(f"Unsupported vector DB: {vector_db}")
+    key = (vector_db, namespace)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = STORE_TYPES[vector_db](namespace)
+        return _stores[key]
+
+# forget a long-lived store; searches already holding it finish on the old object, the next get_store reopens it
+def drop_store(vector_db, namespace):
+    with _stores_lock:
+        return _stores.pop((vector_db, namespace), None)
+
+# stats of every store opened in this process
+def store_stats():
+    stats = {}
+    for (vector_db, namespace), store in list(_stores.items()):
+        if vector_db == "redis_async":
+            continue
+        try:
+            stats[f"{vector_db}:{namespace}"] = store.stats()
+        except Exception as e:
+            stats[f"{vector_db}:{namespace}"] = {"error": f"{type(e).__name__}: {e}"}
+    return stats
@@ -0,0 +1,40 @@
+import os
+import sys
+import pytest
+
+# the modules under src/ import each other by bare name, as when the scripts are run directly
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import indexing
+import query_cache
+import vector_stores
+
+# faiss index files, manifests and index versions go to a temp dir, and every test starts with empty caches
+# and no long-lived stores
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_stores, "FAISS_INDEX_DIR", str(tmp_path / "faiss_indexes"))
+    monkeypatch.setattr(indexing, "MANIFEST_DIR", str(tmp_path / "manifests"))
+    monkeypatch.setattr(query_cache, "INDEX_VERSIONS_FILE", str(tmp_path / "index_versions.json"))
+    monkeypatch.setitem(query_cache._versions, "mtime", None)
+    monkeypatch.setitem(query_cache._versions, "versions", {})
+    query_cache.configure_caches()
+    vector_stores._stores.clear()
+    yield tmp_path
+    query_cache.configure_caches()
+    vector_stores._stores.clear()
+
+# chunk metadata rows: `per_source` chunks for each source, module named after the source
+def make_chunks(sources, per_source, text="chunk"):
+    rows = []
+    for source in sources:
+        for i in range(per_source):
+            rows.append({
+                "text": f"{text} {i} of {source}",
+                "module": source.rsplit(".", 1)[0],
+                "source": source,
+                "slide_number": i + 1,
+                "start_char": i * 100,
+                "end_char": i * 100 + 120
+            })
+    return rows
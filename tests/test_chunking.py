@@ -0,0 +1,32 @@
+import pytest
+from chunking import iter_chunk_spans, chunk_by_tokens, word_token_spans
+
+TEXT = ("Transactions are atomic. A commit makes every write durable, and isolation hides "
+        "uncommitted changes from other readers! Replicas copy the log. ") * 7
+
+# windows the original implementation produced: one per `step` tokens, the last ones running short
+def reference_spans(text, chunk_size, overlap):
+    tokens = list(word_token_spans(text))
+    step = chunk_size - overlap
+    return [(tokens[i][0], tokens[min(i + chunk_size, len(tokens)) - 1][1]) for i in range(0, len(tokens), step)]
+
+@pytest.mark.parametrize("chunk_size,overlap", [(10, 0), (10, 3), (25, 24), (7, 2), (1000, 50)])
+def test_trailing_windows_match_reference(chunk_size, overlap):
+    assert list(iter_chunk_spans(TEXT, chunk_size, overlap)) == reference_spans(TEXT, chunk_size, overlap)
+
+def test_last_window_ends_at_last_token():
+    tokens = list(word_token_spans(TEXT))
+    spans = list(iter_chunk_spans(TEXT, 12, 4))
+    assert spans[-1][1] == tokens[-1][1]
+    assert spans[-1][0] == tokens[(len(tokens) - 1) // 8 * 8][0]
+
+def test_chunks_are_slices_of_the_original_text():
+    for chunk, (start, end) in zip(chunk_by_tokens(TEXT, 10, 3), iter_chunk_spans(TEXT, 10, 3)):
+        assert chunk == TEXT[start:end]
+
+def test_empty_text_has_no_chunks():
+    assert list(iter_chunk_spans("", 10, 3)) == []
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        list(iter_chunk_spans(TEXT, 5, 5))
@@ -0,0 +1,66 @@
+from context_builder import build_context, merge_chunks, dedupe_passages, estimate_tokens
+
+DOCUMENT = "Atomicity means all or nothing. Consistency keeps invariants. Isolation hides concurrent writes. " * 3
+
+def chunk(start, end, source="acid.pdf", text=None):
+    return {
+        "text": DOCUMENT[start:end] if text is None else text,
+        "module": source.rsplit(".", 1)[0],
+        "source": source,
+        "start_char": start,
+        "end_char": end
+    }
+
+def test_overlapping_chunks_merge_into_the_source_text():
+    passages, merged = merge_chunks([chunk(40, 120), chunk(0, 60), chunk(100, 180)])
+    assert merged == 2
+    assert len(passages) == 1
+    assert passages[0]["text"] == DOCUMENT[0:180]
+    assert (passages[0]["start_char"], passages[0]["end_char"], passages[0]["chunks"]) == (0, 180, 3)
+
+def test_adjacent_chunks_merge_with_a_space():
+    passages, merged = merge_chunks([chunk(0, 31), chunk(32, 62)])
+    assert merged == 1
+    assert passages[0]["text"] == DOCUMENT[0:31] + " " + DOCUMENT[32:62]
+
+def test_distant_chunks_and_other_sources_stay_apart_in_rank_order():
+    other = chunk(0, 40, source="mongo.pdf", text="Documents are stored as BSON.")
+    passages, merged = merge_chunks([chunk(200, 260), other, chunk(0, 40)])
+    assert merged == 0
+    assert [p["text"] for p in passages] == [DOCUMENT[200:260], other["text"], DOCUMENT[0:40]]
+
+def test_chunks_without_positions_are_kept_as_is():
+    legacy = {"text": "No offsets here.", "module": "notes"}
+    passages, merged = merge_chunks([legacy, chunk(0, 40)])
+    assert merged == 0
+    assert passages[0]["text"] == "No offsets here."
+
+def test_dedupe_drops_repeats_and_contained_passages():
+    passages = [{"text": "Isolation hides  concurrent writes."}, {"text": "isolation hides concurrent writes."},
+                {"text": "hides concurrent"}, {"text": "Replicas copy the log."}]
+    kept, duplicates = dedupe_passages(passages)
+    assert duplicates == 2
+    assert [p["text"] for p in kept] == ["Isolation hides  concurrent writes.", "Replicas copy the log."]
+
+def test_context_stays_within_the_token_budget():
+    chunks = [chunk(0, 40, source=f"doc{i}.pdf", text=f"Passage {i} " + "word " * 50) for i in range(10)]
+    text, report = build_context(chunks, token_budget=200)
+    assert report["context_tokens"] <= 200
+    assert estimate_tokens(text) <= 200 + report["context_passages"]
+    assert report["context_passages"] + report["context_dropped"] == 10
+    assert report["context_tokens_saved"] == report["context_tokens_raw"] - report["context_tokens"]
+    # best-ranked passages are kept first
+    assert text.startswith("Passage 0 ")
+
+def test_oversized_best_passage_is_truncated_not_dropped():
+    text, report = build_context([chunk(0, 40, text="word " * 500)], token_budget=50)
+    assert report["context_truncated"]
+    assert report["context_passages"] == 1
+    assert 0 < estimate_tokens(text) <= 50
+
+def test_report_counts_merges_and_duplicates():
+    chunks = [chunk(0, 60), chunk(40, 120), chunk(0, 40, source="copy.pdf", text=DOCUMENT[0:30])]
+    text, report = build_context(chunks, token_budget=1000)
+    assert report["context_merged"] == 1
+    assert report["context_duplicates"] == 1
+    assert text == DOCUMENT[0:120]
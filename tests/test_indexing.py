@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from conftest import make_chunks
+
+pytest.importorskip("faiss")
+
+import indexing
+from embedding_store import write_embeddings
+from vector_stores import FaissStore, chunk_id
+
+DIM = 16
+
+def write_store(workspace, data, seed, dtype="float32"):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((len(data), DIM)).astype(np.float32)
+    stem = str(workspace / "embedding_results" / "test_config")
+    (workspace / "embedding_results").mkdir(exist_ok=True)
+    write_embeddings(stem, embeddings, data, dtype=dtype)
+    return stem, embeddings
+
+def indexed(config="test_config"):
+    store = FaissStore(config)
+    store.load()
+    return store
+
+# initial corpus, then one source edited, one removed and one added
+def changed_corpus():
+    before = make_chunks(["btree.pdf", "redis.pdf", "mongo.pdf"], 30)
+    after = ([entry for entry in before if entry["source"] == "btree.pdf"]
+             + make_chunks(["redis.pdf"], 25, text="revised chunk")
+             + make_chunks(["neo4j.pdf"], 30))
+    return before, after
+
+def test_incremental_update_applies_only_the_difference(workspace, capsys):
+    before, after = changed_corpus()
+    stem, _ = write_store(workspace, before, seed=1)
+    indexing.load_and_store_embeddings(stem, vector_db="faiss")
+
+    stem, embeddings = write_store(workspace, after, seed=2)
+    indexing.load_and_store_embeddings(stem, vector_db="faiss", incremental=True)
+    output = capsys.readouterr().out
+    assert "Incremental update: 2 new/changed and 1 removed documents" in output
+    assert "Upserted 55 and deleted 60 vectors" in output
+
+    store = indexed()
+    assert store.index.ntotal == len(after)
+    assert sorted((chunk_id(e), e["text"]) for e in store.metadata) == sorted((chunk_id(e), e["text"]) for e in after)
+
+    # rows and vectors stay aligned after removals: every new vector finds its own chunk first
+    revised = [i for i, entry in enumerate(after) if entry["source"] in ("redis.pdf", "neo4j.pdf")]
+    hits = store.search_batch(embeddings[revised], top_k=1)
+    assert [row[0]["text"] for row in hits] == [after[i]["text"] for i in revised]
+
+def test_unchanged_store_is_a_no_op(workspace, capsys):
+    before, _ = changed_corpus()
+    stem, _ = write_store(workspace, before, seed=1)
+    indexing.load_and_store_embeddings(stem, vector_db="faiss")
+    indexing.load_and_store_embeddings(stem, vector_db="faiss", incremental=True)
+    assert "Upserted 0 and deleted 0 vectors" in capsys.readouterr().out
+    assert indexed().index.ntotal == len(before)
+
+def test_index_without_removal_is_rebuilt_with_every_vector(workspace, capsys):
+    before, after = changed_corpus()
+    stem, _ = write_store(workspace, before, seed=1)
+    indexing.load_and_store_embeddings(stem, vector_db="faiss", faiss_index_type="hnsw")
+
+    stem, embeddings = write_store(workspace, after, seed=2)
+    indexing.load_and_store_embeddings(stem, vector_db="faiss", incremental=True, faiss_index_type="hnsw")
+    assert f"Rebuilt faiss hnsw index with {len(after)} vectors" in capsys.readouterr().out
+
+    store = indexed()
+    assert store.index_type == "hnsw"
+    assert store.index.ntotal == len(after)
+    assert store.search_batch(embeddings[:1], top_k=1)[0][0]["text"] == after[0]["text"]
+
+def test_reduced_precision_store_keeps_its_scalar_quantized_index(workspace):
+    before, after = changed_corpus()
+    stem, _ = write_store(workspace, before, seed=1, dtype="float16")
+    indexing.load_and_store_embeddings(stem, vector_db="faiss")
+    assert indexed().index_type == "sq_fp16"
+
+    stem, _ = write_store(workspace, after, seed=2, dtype="float16")
+    indexing.load_and_store_embeddings(stem, vector_db="faiss", incremental=True)
+    store = indexed()
+    assert store.index_type == "sq_fp16"
+    assert store.index.ntotal == len(after)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+import query_cache
+from conftest import make_chunks
+from query_cache import TTLCache, MISSING, retrieval_cache, embedding_cache, index_version, mark_index_rebuilt
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is MISSING
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+def test_cache_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    cache = TTLCache(ttl_sec=10)
+    cache.put("a", None)
+    now[0] += 5
+    assert cache.get("a") is None
+    now[0] += 6
+    assert cache.get("a") is MISSING
+    assert cache.stats()["size"] == 0
+
+def test_zero_entries_disables_caching():
+    cache = TTLCache(max_entries=0)
+    cache.put("a", 1)
+    assert cache.get("a") is MISSING
+
+def test_rebuild_changes_version_and_drops_only_that_index(workspace):
+    assert index_version("cfg", "faiss") is None
+    mark_index_rebuilt("cfg", "faiss")
+    mark_index_rebuilt("other", "faiss")
+    version = index_version("cfg", "faiss")
+    other_version = index_version("other", "faiss")
+    retrieval_cache.put(("faiss", "cfg", version, None, "q"), ["old"])
+    retrieval_cache.put(("faiss", "other", other_version, None, "q"), ["kept"])
+    assert index_version("cfg", "faiss") == version
+
+    mark_index_rebuilt("cfg", "faiss")
+    assert index_version("cfg", "faiss") != version
+    assert retrieval_cache.get(("faiss", "cfg", version, None, "q")) is MISSING
+    assert retrieval_cache.get(("faiss", "other", other_version, None, "q")) == ["kept"]
+
+def test_retrievals_are_served_from_cache_until_the_index_is_rebuilt(workspace):
+    pytest.importorskip("faiss")
+    import indexing
+    from query import query_vector_db_batch
+    from embedding import cache_model_name
+    from embedding_store import write_embeddings, config_name
+
+    model = "test-model"
+    stem = str(workspace / config_name(model, 200, 0))
+    rng = np.random.default_rng(3)
+    embeddings = rng.standard_normal((40, 8)).astype(np.float32)
+    question = "what is a b-tree?"
+    # the question embedding comes from the cache, so no embedding model is loaded
+    embedding_cache.put((cache_model_name(model), question), embeddings[5])
+
+    def index(text):
+        write_embeddings(stem, embeddings, make_chunks(["btree.pdf"], 40, text=text))
+        indexing.load_and_store_embeddings(stem, vector_db="faiss")
+
+    def ask():
+        return query_vector_db_batch([question], embed_model=model, vector_db="faiss", chunk_size=200, overlap=0,
+                                     top_k=1)[0][0]["text"]
+
+    index("first build")
+    assert ask() == "first build 5 of btree.pdf"
+    hits = retrieval_cache.stats()["hits"]
+    assert ask() == "first build 5 of btree.pdf"
+    assert retrieval_cache.stats()["hits"] == hits + 1
+
+    index("second build")
+    assert ask() == "second build 5 of btree.pdf"
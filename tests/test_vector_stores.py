@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from conftest import make_chunks
+
+pytest.importorskip("faiss")
+
+from vector_stores import FaissStore
+
+SOURCES = ["btree.pdf", "redis.pdf", "mongo.pdf", "neo4j.pdf"]
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(7)
+    data = make_chunks(SOURCES, 50)
+    embeddings = rng.standard_normal((len(data), 16)).astype(np.float32)
+    return embeddings, data
+
+def unit(matrix):
+    return matrix / np.linalg.norm(matrix, axis=-1, keepdims=True)
+
+# exact cosine top-k among rows whose module is in `modules`
+def brute_force(embeddings, data, query, top_k, modules):
+    rows = [i for i, entry in enumerate(data) if entry["module"] in modules]
+    scores = unit(embeddings[rows]) @ unit(query)
+    return [data[rows[i]]["text"] for i in np.argsort(-scores)[:top_k]]
+
+def build(workspace, embeddings, data, index_type="flat"):
+    store = FaissStore("test_config", index_type)
+    store.create(embeddings.shape[1], train_vectors=embeddings)
+    store.bulk_add(embeddings, data)
+    return store
+
+def test_filtered_search_matches_brute_force(workspace, corpus):
+    embeddings, data = corpus
+    store = build(workspace, embeddings, data)
+    queries = embeddings[:5] + 0.1
+    for modules in (["redis"], ["btree", "neo4j"]):
+        results = store.search_batch(queries, top_k=5, filters={"module": modules})
+        for query, hits in zip(queries, results):
+            assert [hit["text"] for hit in hits] == brute_force(embeddings, data, query, 5, modules)
+
+def test_filters_survive_save_and_load(workspace, corpus):
+    embeddings, data = corpus
+    build(workspace, embeddings, data).save()
+    store = FaissStore("test_config")
+    store.load()
+    hits = store.search_batch(embeddings[:1], top_k=5, filters={"source": "mongo.pdf"})[0]
+    assert [hit["text"] for hit in hits] == brute_force(embeddings, data, embeddings[0], 5, ["mongo"])
+
+@pytest.mark.parametrize("index_type,params", [("hnsw", {"ef_search": 200}), ("ivf_flat", {"nprobe": 100}), ("sq8", {})])
+def test_approximate_indexes_only_return_filtered_rows(workspace, corpus, index_type, params):
+    embeddings, data = corpus
+    store = build(workspace, embeddings, data, index_type)
+    hits = store.search_batch(embeddings[:3], top_k=10, filters={"module": ["redis", "mongo"]}, **params)
+    for row in hits:
+        assert len(row) == 10
+        assert {hit["module"] for hit in row} <= {"redis", "mongo"}
+
+def test_filters_combine_across_fields(workspace, corpus):
+    embeddings, data = corpus
+    store = build(workspace, embeddings, data)
+    assert store.search_batch(embeddings[:2], top_k=3, filters={"module": "redis", "source": "mongo.pdf"}) == [[], []]
+    hits = store.search_batch(embeddings[:1], top_k=3, filters={"module": "redis", "source": "redis.pdf"})[0]
+    assert len(hits) == 3 and all(hit["source"] == "redis.pdf" for hit in hits)
+
+def test_unknown_filter_field_is_rejected(workspace, corpus):
+    embeddings, data = corpus
+    store = build(workspace, embeddings, data)
+    with pytest.raises(ValueError):
+        store.search_batch(embeddings[:1], top_k=3, filters={"slide_number": 1})